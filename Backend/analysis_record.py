@@ -0,0 +1,121 @@
+import io
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rep_detection import Rep, reps_from_array
+from scoring_engine import SEVERITY_LEVELS
+
+# Rough size of the Python objects around a record's arrays (object, arrays, strings)
+RECORD_OVERHEAD_BYTES = 2048
+
+class AnalysisRecord:
+    """Compact stored form of a finished analysis.
+
+    Keeps the mean similarity over the scored frames, one row per detected rep and
+    joint errors as per-joint, per-severity frame counters with deviation
+    statistics. Its size depends on the number of reps, not frames, and
+    human-readable summaries are rendered from it when a response is built.
+    """
+
+    __slots__ = ("session_id", "joint_names", "scored_frames", "overall_similarity", "reps", "rep_joint",
+                 "severity_counts", "worst_deviation", "mean_deviation", "error_frames", "recommendations",
+                 "analysis_duration", "stage_durations", "total_frames", "sampled_frames", "difficulty",
+                 "created_at")
+
+    # Arrays written by to_bytes(), next to a JSON "meta" entry for the scalar fields
+    _ARRAY_FIELDS = ("reps", "severity_counts", "worst_deviation", "mean_deviation", "error_frames")
+
+    def __init__(self, session_id: str, joint_names: Sequence[str], scored_frames: int,
+                 overall_similarity: float, reps: np.ndarray, rep_joint: Optional[str],
+                 severity_counts: np.ndarray, worst_deviation: np.ndarray, mean_deviation: np.ndarray,
+                 error_frames: np.ndarray, recommendations: List[str], analysis_duration: float,
+                 total_frames: int, sampled_frames: int, difficulty: Optional[str] = None,
+                 created_at: Optional[float] = None, stage_durations: Optional[Dict[str, float]] = None):
+        self.session_id = session_id
+        self.joint_names = joint_names
+        self.scored_frames = scored_frames
+        self.overall_similarity = overall_similarity
+        self.reps = np.array(reps, dtype=np.float32).reshape(-1, len(Rep._fields))  # (reps, 7), see rep_array
+        self.rep_joint = rep_joint
+        self.severity_counts = np.array(severity_counts, dtype=np.int32)      # (joints, 3) frames per severity
+        self.worst_deviation = np.array(worst_deviation, dtype=np.float32)    # (joints,) degrees
+        self.mean_deviation = np.array(mean_deviation, dtype=np.float32)      # (joints,) degrees
+        self.error_frames = np.array(error_frames, dtype=np.int32)            # (joints,) frames out of tolerance
+        self.recommendations = recommendations
+        self.analysis_duration = analysis_duration
+        self.stage_durations = stage_durations or {}  # seconds per pipeline stage, see metrics.StageTimer
+        self.total_frames = total_frames
+        self.sampled_frames = sampled_frames
+        self.difficulty = difficulty
+        self.created_at = time.time() if created_at is None else created_at
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by this record, used for the session cache budget"""
+        return (RECORD_OVERHEAD_BYTES
+                + sum(getattr(self, name).nbytes for name in self._ARRAY_FIELDS)
+                + sum(len(text) for text in self.recommendations))
+
+    def to_bytes(self) -> bytes:
+        """Serialize as an uncompressed .npz blob for session storage"""
+        meta = {
+            "session_id": self.session_id,
+            "joint_names": list(self.joint_names),
+            "scored_frames": self.scored_frames,
+            "overall_similarity": self.overall_similarity,
+            "rep_joint": self.rep_joint,
+            "recommendations": self.recommendations,
+            "analysis_duration": self.analysis_duration,
+            "stage_durations": self.stage_durations,
+            "total_frames": self.total_frames,
+            "sampled_frames": self.sampled_frames,
+            "difficulty": self.difficulty,
+            "created_at": self.created_at
+        }
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+                 **{name: getattr(self, name) for name in self._ARRAY_FIELDS})
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AnalysisRecord":
+        with np.load(io.BytesIO(data)) as arrays:
+            meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+            fields = {name: arrays[name] for name in cls._ARRAY_FIELDS}
+        return cls(**meta, **fields)
+
+    def rep_summary(self) -> List[Dict[str, Any]]:
+        return [rep.to_dict(i + 1) for i, rep in enumerate(reps_from_array(self.reps))]
+
+    def joint_error_summary(self) -> Dict[str, List[str]]:
+        """One line per flagged joint, listed under the worst severity it reached"""
+        errors = {level: [] for level in reversed(SEVERITY_LEVELS)}
+        for name, counts, worst in zip(self.joint_names, self.severity_counts.tolist(),
+                                       self.worst_deviation.tolist()):
+            flagged = sum(counts)
+            if not flagged:
+                continue
+            level = max(i for i, count in enumerate(counts) if count)
+            errors[SEVERITY_LEVELS[level]].append(
+                f"{name}: {worst:.1f}° worst deviation, flagged in {flagged} frames "
+                f"({', '.join(f'{count} {SEVERITY_LEVELS[i]}' for i, count in enumerate(counts) if count)})"
+            )
+        return errors
+
+    def joint_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-joint severity counts, deviation statistics and fraction of frames out of tolerance"""
+        frames = self.scored_frames
+        return {
+            name: {
+                **{level: int(count) for level, count in zip(SEVERITY_LEVELS, counts)},
+                "worst_deviation": round(worst, 1),
+                "mean_deviation": round(mean, 1),
+                "time_in_error": round(errors / frames, 3) if frames else 0.0
+            }
+            for name, counts, worst, mean, errors in zip(
+                self.joint_names, self.severity_counts.tolist(), self.worst_deviation.tolist(),
+                self.mean_deviation.tolist(), self.error_frames.tolist())
+        }
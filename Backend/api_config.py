@@ -38,14 +38,20 @@ class Settings(BaseSettings):
     min_detection_confidence: float = 0.7
     min_tracking_confidence: float = 0.5
     model_complexity: int = 2
+    pose_pool_size: int = 4  # Pose instances per (complexity, confidence) setting
+    pose_checkout_timeout: float = 10.0  # seconds to wait for a free Pose instance
     
     # Analysis Configuration
     max_video_size_mb: int = 50
     max_analysis_duration: int = 300  # seconds
     default_capture_fps: int = 30
+    analysis_target_fps: Optional[float] = None  # sample videos at this rate; None analyzes every frame
+    inference_max_long_edge: Optional[int] = 1280  # downscale frames before pose inference; None keeps full size
     
     # File Storage
     templates_dir: str = "templates"
+    pose_cache_dir: str = "cache/pose_tracks"
+    pose_cache_max_mb: int = 2048  # 0 disables the pose track cache
     temp_dir: str = "temp"
     sessions_dir: str = "sessions"
     logs_dir: str = "logs"
@@ -63,6 +69,7 @@ class Settings(BaseSettings):
     # Security Configuration
     secret_key: str = "your-secret-key-change-in-production"
     access_token_expire_minutes: int = 30
+    admin_token: Optional[str] = None  # sent as X-Admin-Token for admin features (profiling); None disables them
     
     # Logging Configuration
     log_level: str = "INFO"
@@ -70,8 +77,11 @@ class Settings(BaseSettings):
     
     # Performance Configuration
     max_concurrent_analyses: int = 5
-    enable_caching: bool = True
-    cache_ttl_seconds: int = 3600
+    job_ttl_seconds: int = 3600  # video analysis job records are dropped this long after their last update
+    enable_caching: bool = True  # keep recent analysis sessions in memory; False writes them straight to sessions_dir
+    cache_ttl_seconds: int = 3600  # sessions untouched this long move from memory to sessions_dir
+    session_cache_max_mb: int = 256  # memory budget for cached analysis sessions
+    profile_top_entries: int = 30  # functions and allocation sites listed in a profile report
     
     # Quality Thresholds
     min_pose_visibility: float = 0.5
@@ -97,6 +107,15 @@ class Settings(BaseSettings):
     # Real-time Analysis
     similarity_buffer_size: int = 150  # frames
     feedback_update_interval: float = 0.1  # seconds
+    live_max_frames_per_message: int = 64  # frames accepted in one WebSocket message
+    
+    # Movement templates (keyframe sequences scored with dynamic time warping)
+    max_template_keyframes: int = 200  # keyframes accepted per template
+    dtw_max_step_ratio: float = 0.1  # furthest a frame may move on through the keyframes, as a fraction of their count
+    
+    # Repetition detection
+    rep_min_range_degrees: float = 30.0  # joint swing needed to confirm a turning point
+    rep_smoothing: float = 0.5  # weight of the newest angle in the moving average
     
     class Config:
         env_file = ".env"
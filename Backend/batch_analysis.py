@@ -0,0 +1,236 @@
+"""Offline batch analysis of a directory of videos.
+
+Run from ``Backend/``::
+
+    python batch_analysis.py videos/ --output results/ --template <id> [--template <id> ...]
+
+Every video under the input directory is decoded and run through pose inference
+on a process pool with one worker per CPU core. For ``videos/a/b.mp4`` the
+landmark track is written to ``results/a/b.npz`` (the same format as the pose
+track cache). When templates are given, ``results/a/b.scores.json`` holds one
+analysis result per template, scored exactly as ``/analyze/video`` would.
+
+Runs are resumable. A video whose scores file already covers the requested
+templates is skipped. A video with a track but no scores is rescored from the
+saved track without running pose inference again. Outputs are written
+atomically, so an interrupted run never leaves a partial file behind.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from api_config import get_settings
+from track_cache import read_track_file, write_track_file
+from video_pipeline import PoseTrack, extract_pose_track
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+class BatchItem(NamedTuple):
+    video: Path
+    track_path: Path
+    scores_path: Path
+
+def find_videos(input_dir: Path, output_dir: Path, extensions) -> List[BatchItem]:
+    """Every video below ``input_dir``, with its output paths mirrored under ``output_dir``"""
+    items = []
+    for video in sorted(input_dir.rglob("*")):
+        if video.is_file() and video.suffix.lower() in extensions:
+            target = output_dir / video.relative_to(input_dir).with_suffix("")
+            items.append(BatchItem(video, target.with_suffix(".npz"), target.with_suffix(".scores.json")))
+    return items
+
+def has_scores(item: BatchItem, template_ids: List[str]) -> bool:
+    """Whether this video's scores file already covers every requested template"""
+    if not template_ids:
+        return True
+    try:
+        with open(item.scores_path, "r", encoding="utf-8") as f:
+            scored = json.load(f).get("results", {})
+    except (FileNotFoundError, ValueError):
+        return False
+    return all(tid in scored for tid in template_ids)
+
+def write_json(path: Path, data: Dict):
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+class BatchStats:
+    """Counters for the throughput summary printed at the end of a run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.extracted = 0
+        self.rescored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.total_frames = 0
+        self.sampled_frames = 0
+        self.pose_frames = 0
+        self.stage_durations: Dict[str, float] = {}
+
+    def add_track(self, track: PoseTrack):
+        self.extracted += 1
+        self.total_frames += track.total_frames
+        self.sampled_frames += track.sampled_frames
+        self.pose_frames += len(track.landmarks)
+        for stage, seconds in (track.stage_durations or {}).items():
+            self.stage_durations[stage] = self.stage_durations.get(stage, 0.0) + seconds
+
+    def summary(self, workers: int) -> str:
+        elapsed = time.perf_counter() - self.started
+        lines = [
+            f"Videos: {self.extracted} extracted, {self.rescored} rescored from saved tracks, "
+            f"{self.skipped} skipped, {self.failed} failed",
+            f"Frames: {self.total_frames} decoded, {self.sampled_frames} analyzed, "
+            f"{self.pose_frames} with a pose",
+            f"Wall time: {elapsed:.1f}s with {workers} workers",
+            f"Throughput: {self.sampled_frames / elapsed if elapsed else 0.0:.1f} analyzed frames/s "
+            f"({self.total_frames / elapsed if elapsed else 0.0:.1f} decoded frames/s)"
+        ]
+        worker_seconds = sum(self.stage_durations.values())
+        if worker_seconds:
+            lines.append("Worker time: " + ", ".join(
+                f"{stage} {seconds:.1f}s ({seconds / worker_seconds:.0%})"
+                for stage, seconds in sorted(self.stage_durations.items(), key=lambda item: -item[1])
+            ))
+            lines.append(f"Per worker: {self.sampled_frames / worker_seconds:.1f} analyzed frames/s")
+        return "\n".join(lines)
+
+def run_batch(args) -> int:
+    settings = get_settings()
+    input_dir = Path(args.input_dir)
+    output_dir = Path(args.output)
+    if not input_dir.is_dir():
+        print(f"Not a directory: {input_dir}", file=sys.stderr)
+        return 2
+
+    # Imported here, not at module level, so spawned extraction workers (which
+    # re-import this module) do not build the API app and open its storage
+    from exercise_analysis_backend import build_analysis_record, difficulty_level, template_store, to_analysis_result
+    from fastapi import HTTPException
+    from fastapi.encoders import jsonable_encoder
+
+    template_ids = list(dict.fromkeys(args.template))
+    templates = {}
+    if template_ids:
+        template_store.load()
+        for tid in template_ids:
+            stored = template_store.get(tid)
+            if stored is None:
+                print(f"Template not found: {tid}", file=sys.stderr)
+                return 2
+            templates[tid] = stored
+    try:
+        difficulty_level(args.difficulty)
+    except HTTPException as e:
+        print(e.detail, file=sys.stderr)
+        return 2
+
+    def score(item: BatchItem, track: PoseTrack):
+        if not templates:
+            return
+        results = {}
+        for tid, stored in templates.items():
+            record = build_analysis_record(
+                str(uuid.uuid4()), track.landmarks, stored.compiled, track.total_frames, track.sampled_frames,
+                datetime.now(), args.difficulty, track.fps, track.stage_durations, track.frame_times
+            )
+            results[tid] = {"name": stored.name, **jsonable_encoder(to_analysis_result(record))}
+        write_json(item.scores_path, {
+            "video": str(item.video),
+            "track": str(item.track_path),
+            "difficulty": args.difficulty,
+            "results": results
+        })
+
+    stats = BatchStats()
+    pending = []
+    items = find_videos(input_dir, output_dir, tuple(ext.lower() for ext in args.extensions))
+    for item in items:
+        if args.force or not item.track_path.exists():
+            pending.append(item)
+        elif not has_scores(item, template_ids):
+            try:
+                score(item, PoseTrack(*read_track_file(item.track_path), cached=True))
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"{item.video}: could not rescore from {item.track_path}: {e}")
+                continue
+            stats.rescored += 1
+        else:
+            stats.skipped += 1
+    print(f"{len(items)} videos found, {len(pending)} to extract")
+
+    workers = args.workers or os.cpu_count() or 1
+    max_long_edge = settings.inference_max_long_edge if args.max_long_edge is None else (args.max_long_edge or None)
+    # spawn keeps MediaPipe's native threads out of the forked children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(
+                extract_pose_track, str(item.video),
+                args.model_complexity if args.model_complexity is not None else settings.model_complexity,
+                settings.min_detection_confidence, settings.min_tracking_confidence,
+                args.target_fps or settings.analysis_target_fps, settings.default_capture_fps, max_long_edge
+            ): item
+            for item in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            item = futures[future]
+            try:
+                track = future.result()
+                item.track_path.parent.mkdir(parents=True, exist_ok=True)
+                write_track_file(item.track_path, track.landmarks, track.total_frames, track.sampled_frames,
+                                 track.fps, track.frame_times)
+                score(item, track)
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"{item.video}: {e}")
+                continue
+            stats.add_track(track)
+            pose_seconds = (track.stage_durations or {}).get("pose", 0.0)
+            print(f"[{done}/{len(pending)}] {item.video}: {track.sampled_frames} frames, "
+                  f"{len(track.landmarks)} with a pose"
+                  + (f", {track.sampled_frames / pose_seconds:.1f} fps inference" if pose_seconds else ""))
+
+    print(stats.summary(workers))
+    return 1 if stats.failed else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract pose tracks and scores for a directory of videos")
+    parser.add_argument("input_dir", help="directory searched recursively for videos")
+    parser.add_argument("--output", "-o", required=True, help="directory for .npz tracks and .scores.json files")
+    parser.add_argument("--template", "-t", action="append", default=[],
+                        help="template id to score against (repeatable); without one only tracks are written")
+    parser.add_argument("--difficulty", default=None, help="difficulty level used for scoring")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    parser.add_argument("--target-fps", type=float, default=None, help="sample videos at this rate")
+    parser.add_argument("--max-long-edge", type=int, default=None,
+                        help="downscale frames to this long edge before inference; 0 keeps full size")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=None)
+    parser.add_argument("--extensions", nargs="+", default=list(VIDEO_EXTENSIONS), help="video file extensions")
+    parser.add_argument("--force", action="store_true", help="re-extract videos that already have a track")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    sys.exit(run_batch(parse_args(argv)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Offline performance benchmarks for the analysis pipeline.
+
+Run from ``Backend/``::
+
+    python -m benchmarks.run_benchmarks                      # results/<timestamp>.json
+    python -m benchmarks.run_benchmarks --save-baseline      # ... and store it as baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare old.json new.json
+
+Every stage runs on synthetic data generated on the fly (landmark tracks and small
+videos written with cv2.VideoWriter), so no camera, network or sample media is
+needed. Against a baseline, a stage whose median time grew by more than
+``--threshold`` is reported as a regression and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+DEFAULT_RESULTS_DIR = BENCHMARKS_DIR / "results"
+
+class Stage(NamedTuple):
+    name: str
+    items: int   # work units per run, e.g. frames
+    unit: str
+    run: Callable[[], object]
+
+def measure(stage: Stage, repeat: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        stage.run()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stage.run()
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    return {
+        "items": stage.items,
+        "unit": stage.unit,
+        "repeat": repeat,
+        "median_ms": round(median * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "per_item_us": round(median / stage.items * 1e6, 3) if stage.items else None
+    }
+
+def isolate_backend(work_dir: str, model_complexity: Optional[int]):
+    """Point every directory the backend writes to at ``work_dir`` before it is imported"""
+    for name in ("templates", "sessions", "temp", "logs"):
+        os.environ[f"{name.upper()}_DIR"] = os.path.join(work_dir, name)
+    os.environ["POSE_CACHE_DIR"] = os.path.join(work_dir, "pose_tracks")
+    os.environ["POSE_CACHE_MAX_MB"] = "0"  # every end-to-end run must decode and infer
+    os.environ.pop("DATABASE_URL", None)
+    if model_complexity is not None:
+        os.environ["MODEL_COMPLEXITY"] = str(model_complexity)
+
+def analysis_stages(args) -> List[Stage]:
+    """Scoring, joint-angle analysis and recommendations on a synthetic track"""
+    import numpy as np
+    from exercise_analysis_backend import analyzer
+    from scoring_engine import JointErrorAggregator
+    from benchmarks.synthetic import synthetic_track
+
+    engine = analyzer.engine
+    track = synthetic_track(args.frames, seed=1)
+    template = engine.compile_template(synthetic_track(1, seed=2)[0])
+    # Keyframes sample one 2 s rep; the track repeats that rep for its whole length
+    movement = engine.with_sequence(template, synthetic_track(args.keyframes, fps=args.keyframes / 2.0, seed=3))
+    _, errors, _ = analyzer.score_track(track, template)
+    similarity = 72.5
+
+    def joint_angle_analysis():
+        aggregator = JointErrorAggregator(engine, template)
+        aggregator.update(np.abs(engine.joint_angles(track) - template.joint_angles))
+
+    return [
+        Stage("scoring", args.frames, "frames", lambda: analyzer.score_track(track, template)),
+        Stage("scoring_dtw", args.frames, "frames", lambda: analyzer.score_track(track, movement)),
+        Stage("joint_angle_analysis", args.frames, "frames", joint_angle_analysis),
+        Stage("recommendations", 1000, "calls",
+              lambda: [analyzer.generate_recommendations(similarity, errors) for _ in range(1000)]),
+    ]
+
+def template_stages(args) -> List[Stage]:
+    """EnhancedTemplateGenerator filtering, stability and averaging on captured-style frames"""
+    from enhanced_template_generator import EnhancedTemplateGenerator
+    from benchmarks.synthetic import synthetic_track
+
+    generator = EnhancedTemplateGenerator()
+    frames = synthetic_track(args.template_frames, seed=4)
+    quality_frames = generator.filter_quality_frames(frames)
+    return [
+        Stage("template_filter", len(frames), "frames", lambda: generator.filter_quality_frames(frames)),
+        Stage("template_stability", len(quality_frames), "frames",
+              lambda: generator.calculate_landmark_stability(quality_frames)),
+        Stage("template_averaging", len(quality_frames), "frames",
+              lambda: generator.average_landmarks(quality_frames)),
+    ]
+
+def video_stages(args, work_dir: str) -> List[Stage]:
+    """Frame decode and preprocessing, and /analyze/video end to end through the test client"""
+    import cv2
+    from benchmarks.synthetic import synthetic_track, write_synthetic_video
+    from video_pipeline import FramePreprocessor
+    from exercise_analysis_backend import settings
+
+    video_path = write_synthetic_video(os.path.join(work_dir, "squats"), args.video_frames)
+
+    def decode():
+        cap = cv2.VideoCapture(video_path)
+        preprocessor = FramePreprocessor(settings.inference_max_long_edge)
+        try:
+            while True:
+                frame = preprocessor.read(cap)
+                if frame is None:
+                    break
+                preprocessor.to_rgb(frame)
+        finally:
+            cap.release()
+
+    stages = [Stage("decode", args.video_frames, "frames", decode)]
+    if not args.skip_e2e:
+        stages.append(Stage("e2e_analyze_video", args.video_frames, "frames",
+                            end_to_end_runner(video_path, synthetic_track(1, seed=2)[0])))
+    return stages
+
+def end_to_end_runner(video_path: str, template_landmarks) -> Callable[[], object]:
+    """Upload the video, then poll the job until its result is available"""
+    from fastapi.testclient import TestClient
+    from exercise_analysis_backend import app
+
+    client = TestClient(app)
+    client.__enter__()  # runs the lifespan: job queue workers and template store
+    template = {
+        "name": "benchmark squat",
+        "landmarks": [dict(zip(("x", "y", "z", "visibility"), landmark))
+                      for landmark in template_landmarks.tolist()]
+    }
+    template_id = client.post("/templates/create", json=template).json()["template_id"]
+    with open(video_path, "rb") as f:
+        video = f.read()
+
+    def run():
+        response = client.post(f"/analyze/video/{template_id}",
+                               files={"video": (os.path.basename(video_path), video, "video/mp4")})
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while True:
+            status = client.get(f"/jobs/{job_id}").json()["status"]
+            if status == "failed":
+                raise RuntimeError(f"Benchmark analysis job {job_id} failed")
+            if status == "completed":
+                return client.get(f"/jobs/{job_id}/result").json()
+            time.sleep(0.005)
+
+    run.client = client
+    return run
+
+def environment() -> Dict:
+    import cv2
+    import numpy as np
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__
+    }
+
+def run_all(args) -> Dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="exercise-bench-") as work_dir:
+        isolate_backend(work_dir, args.model_complexity)
+        groups = [analysis_stages(args), template_stages(args), video_stages(args, work_dir)]
+        try:
+            for stages in groups:
+                for stage in stages:
+                    if args.only and stage.name not in args.only:
+                        continue
+                    print(f"  {stage.name:<24}", end="", flush=True)
+                    repeat = args.e2e_repeat if stage.name.startswith("e2e") else args.repeat
+                    results[stage.name] = measure(stage, repeat, args.warmup)
+                    print(f"{results[stage.name]['median_ms']:>12.3f} ms")
+        finally:
+            for stages in groups:
+                for stage in stages:
+                    client = getattr(stage.run, "client", None)
+                    if client is not None:
+                        client.__exit__(None, None, None)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {
+            "frames": args.frames, "keyframes": args.keyframes, "template_frames": args.template_frames,
+            "video_frames": args.video_frames, "repeat": args.repeat, "warmup": args.warmup
+        },
+        "results": results
+    }
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Per-stage median ratio against the baseline, flagged when outside ``threshold``"""
+    rows = []
+    stages = list(dict.fromkeys([*baseline["results"], *current["results"]]))
+    for name in stages:
+        before = baseline["results"].get(name)
+        after = current["results"].get(name)
+        if before is None or after is None:
+            rows.append({"stage": name, "status": "new" if before is None else "missing",
+                         "baseline_ms": before and before["median_ms"], "current_ms": after and after["median_ms"],
+                         "ratio": None})
+            continue
+        ratio = after["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"stage": name, "status": status, "baseline_ms": before["median_ms"],
+                     "current_ms": after["median_ms"], "ratio": round(ratio, 3)})
+    return rows
+
+def print_comparison(rows: List[Dict]):
+    print(f"\n{'stage':<24}{'baseline ms':>14}{'current ms':>14}{'ratio':>9}  status")
+    for row in rows:
+        baseline = "-" if row["baseline_ms"] is None else f"{row['baseline_ms']:.3f}"
+        current = "-" if row["current_ms"] is None else f"{row['current_ms']:.3f}"
+        ratio = "-" if row["ratio"] is None else f"{row['ratio']:.2f}x"
+        print(f"{row['stage']:<24}{baseline:>14}{current:>14}{ratio:>9}  {row['status']}")
+
+def load(path) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+def save(report: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {path}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the exercise analysis pipeline on synthetic data")
+    parser.add_argument("--frames", type=int, default=10000, help="frames in the synthetic scoring track")
+    parser.add_argument("--keyframes", type=int, default=200, help="keyframes in the movement template")
+    parser.add_argument("--template-frames", type=int, default=300, help="captured frames fed to the template generator")
+    parser.add_argument("--video-frames", type=int, default=150, help="frames in the synthetic video")
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per stage")
+    parser.add_argument("--e2e-repeat", type=int, default=3, help="timed runs of the end-to-end stage")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before measuring")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=None,
+                        help="MediaPipe model for the end-to-end stage (default: settings.model_complexity)")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="run only these stages")
+    parser.add_argument("--skip-e2e", action="store_true", help="skip the end-to-end /analyze/video stage")
+    parser.add_argument("--output", type=Path, help="where to write the results JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against this results file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write the results to {DEFAULT_BASELINE}")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression (default 0.2 = 20%%)")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASELINE", "CURRENT"),
+                        help="compare two saved results files without running anything")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.compare:
+        rows = compare(load(args.compare[1]), load(args.compare[0]), args.threshold)
+        print_comparison(rows)
+        return 1 if any(row["status"] == "regression" for row in rows) else 0
+
+    print("Running benchmarks...")
+    report = run_all(args)
+    output = args.output or DEFAULT_RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    save(report, output)
+    if args.save_baseline:
+        save(report, DEFAULT_BASELINE)
+
+    if args.baseline:
+        rows = compare(report, load(args.baseline), args.threshold)
+        print_comparison(rows)
+        return 1 if any(row["status"] == "regression" for row in rows) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from api_config import POSE_CONNECTIONS
+from scoring_engine import LANDMARK_FIELDS, NUM_LANDMARKS
+
+# Normalized (x, y) image coordinates of a person standing in front of the camera,
+# in MediaPipe landmark order
+STANDING_POSE = np.array([
+    (0.50, 0.15),                                               # nose
+    (0.51, 0.14), (0.52, 0.14), (0.53, 0.14),                   # left eye inner, eye, outer
+    (0.49, 0.14), (0.48, 0.14), (0.47, 0.14),                   # right eye inner, eye, outer
+    (0.54, 0.15), (0.46, 0.15),                                 # ears
+    (0.51, 0.17), (0.49, 0.17),                                 # mouth
+    (0.58, 0.25), (0.42, 0.25),                                 # shoulders
+    (0.62, 0.37), (0.38, 0.37),                                 # elbows
+    (0.63, 0.48), (0.37, 0.48),                                 # wrists
+    (0.64, 0.51), (0.36, 0.51),                                 # pinkies
+    (0.635, 0.52), (0.365, 0.52),                               # index fingers
+    (0.62, 0.50), (0.38, 0.50),                                 # thumbs
+    (0.55, 0.52), (0.45, 0.52),                                 # hips
+    (0.56, 0.70), (0.44, 0.70),                                 # knees
+    (0.56, 0.88), (0.44, 0.88),                                 # ankles
+    (0.555, 0.90), (0.445, 0.90),                               # heels
+    (0.57, 0.92), (0.43, 0.92),                                 # foot indices
+], dtype=np.float32)
+
+# How far each landmark group moves (dx, dy) at the bottom of a squat
+_SQUAT_OFFSETS = np.zeros((NUM_LANDMARKS, 2), dtype=np.float32)
+_SQUAT_OFFSETS[:23] = (-0.04, 0.18)   # head, torso and arms
+_SQUAT_OFFSETS[23:25] = (-0.08, 0.18)  # hips sit back and down
+_SQUAT_OFFSETS[25:27] = (0.10, 0.06)   # knees travel forward
+
+def synthetic_track(frames: int, fps: float = 30, period_seconds: float = 2.0,
+                    noise: float = 0.003, seed: int = 0) -> np.ndarray:
+    """A (frames, 33, 4) float32 landmark track of someone doing squats.
+
+    Depth follows a raised cosine with one rep every ``period_seconds``. Landmark
+    positions get Gaussian jitter, and wrists are occasionally reported with low
+    visibility as if occluded.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / fps
+    depth = (1 - np.cos(2 * np.pi * t / period_seconds)) / 2
+
+    track = np.empty((frames, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    track[:, :, :2] = STANDING_POSE + depth[:, None, None] * _SQUAT_OFFSETS
+    track[:, :, :2] += rng.normal(0, noise, (frames, NUM_LANDMARKS, 2))
+    track[:, :, 2] = rng.normal(0, 0.05, (frames, NUM_LANDMARKS))
+    track[:, :, 3] = rng.uniform(0.8, 1.0, (frames, NUM_LANDMARKS))
+    occluded = rng.random(frames) < 0.05
+    track[occluded, 15:23, 3] = 0.2
+    return track
+
+def write_synthetic_video(path: str, frames: int, fps: float = 30, size=(640, 480), seed: int = 0) -> str:
+    """Render a stick figure doing squats to a video file; returns the path written.
+
+    Uses mp4v in an .mp4 container and falls back to MJPG in an .avi when this
+    OpenCV build cannot write MPEG-4.
+    """
+    track = synthetic_track(frames, fps, seed=seed, noise=0.0)
+    width, height = size
+    path = Path(path)
+    for fourcc, suffix in (("mp4v", ".mp4"), ("MJPG", ".avi")):
+        target = path.with_suffix(suffix)
+        writer = cv2.VideoWriter(str(target), cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if writer.isOpened():
+            break
+        writer.release()
+    else:
+        raise RuntimeError("OpenCV cannot write mp4v or MJPG video here")
+
+    background = np.full((height, width, 3), (60, 70, 80), dtype=np.uint8)
+    try:
+        for frame_landmarks in track:
+            frame = background.copy()
+            points = [(int(x * width), int(y * height)) for x, y in frame_landmarks[:, :2].tolist()]
+            for start, end in POSE_CONNECTIONS:
+                cv2.line(frame, points[start], points[end], (190, 200, 220), 12, cv2.LINE_AA)
+            cv2.circle(frame, points[0], int(0.05 * height), (170, 190, 220), -1, cv2.LINE_AA)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return str(target)
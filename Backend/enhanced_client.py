@@ -4,10 +4,70 @@ import numpy as np
 import requests
 import json
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional
 from datetime import datetime
 import threading
 import queue
+import os
+
+from rep_detection import RepDetector
+
+# Joints measured by calculate_joint_angles, in the order fed to the rep detector
+CLIENT_JOINTS = ('left_elbow', 'right_elbow', 'left_shoulder', 'right_shoulder', 'left_knee', 'right_knee')
+
+class FrameFeedback(NamedTuple):
+    """What the feedback panel shows for one analyzed frame, captured when it was recorded"""
+    similarity: float
+    average_similarity: Optional[float]  # over the last 30 frames, once there are more than 5
+    rep_count: int
+    angles: Dict[str, float]
+
+class LatestFrameQueue:
+    """Single-slot queue between pipeline stages where the newest item wins.
+
+    A producer never blocks: if the consumer has not picked up the previous item
+    yet it is replaced and counted as dropped, so stages never build a backlog.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=1)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float = 0.1):
+        """Return the pending item, or None if nothing arrived within timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class StageRate:
+    """Throughput of one pipeline stage, refreshed about once per second"""
+
+    def __init__(self):
+        self.fps = 0.0
+        self._count = 0
+        self._window_start = time.time()
+
+    def tick(self):
+        self._count += 1
+        now = time.time()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.fps = self._count / elapsed
+            self._count = 0
+            self._window_start = now
 
 class RealTimeExerciseAnalyzer:
     def __init__(self, api_url: str = "http://localhost:8000"):
@@ -21,10 +81,13 @@ class RealTimeExerciseAnalyzer:
             model_complexity=1  # Lower complexity for real-time
         )
         
-        # Analysis buffers
+        # Analysis buffers: a short window for the display, running totals and reps for the session
         self.landmarks_buffer = []
         self.similarity_buffer = []
         self.max_buffer_size = 150  # 5 seconds at 30fps
+        # Guards the session state below; in pipelined mode it is written by the inference thread
+        self._session_lock = threading.Lock()
+        self.reset_session()
         
         # UI colors
         self.colors = {
@@ -39,16 +102,39 @@ class RealTimeExerciseAnalyzer:
         self.template_cache = {}
         self.current_analysis = None
 
-    def get_templates(self) -> Dict:
-        """Fetch available templates from API"""
+    def get_templates(self) -> List[Dict]:
+        """Fetch template summaries (id, name, description, created_at) from the API.
+        
+        Follows the listing's pagination cursor and revalidates each page with its
+        ETag, so unchanged pages are served from template_cache.
+        """
+        templates = []
+        cursor = None
         try:
-            response = requests.get(f"{self.api_url}/templates")
-            if response.status_code == 200:
-                return response.json()['templates']
-            return {}
+            while True:
+                params = {"limit": 100}
+                if cursor:
+                    params["cursor"] = cursor
+                cached = self.template_cache.get(cursor)
+                headers = {"If-None-Match": cached[0]} if cached else {}
+                
+                response = requests.get(f"{self.api_url}/templates", params=params, headers=headers)
+                if response.status_code == 304:
+                    page = cached[1]
+                elif response.status_code == 200:
+                    page = response.json()
+                    if response.headers.get("ETag"):
+                        self.template_cache[cursor] = (response.headers["ETag"], page)
+                else:
+                    return []
+                
+                templates.extend(page['templates'])
+                cursor = page.get('next_cursor')
+                if not cursor:
+                    return templates
         except Exception as e:
             print(f"Error fetching templates: {e}")
-            return {}
+            return []
 
     def get_similarity_color(self, similarity: float) -> tuple:
         """Get color based on similarity score"""
@@ -149,7 +235,7 @@ class RealTimeExerciseAnalyzer:
             
         return (total_similarity / valid_landmarks * 100) if valid_landmarks > 0 else 0.0
 
-    def draw_feedback_panel(self, frame: np.ndarray, similarity: float, angles: Dict[str, float]):
+    def draw_feedback_panel(self, frame: np.ndarray, feedback: FrameFeedback):
         """Draw feedback panel with pose information"""
         panel_height = 300
         panel_width = 300
@@ -173,7 +259,7 @@ class RealTimeExerciseAnalyzer:
         # Similarity score
         cv2.putText(frame, "Overall Score:", (x_offset + 10, y_offset + 55), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        self.draw_similarity_bar(frame, similarity, x_offset + 10, y_offset + 65)
+        self.draw_similarity_bar(frame, feedback.similarity, x_offset + 10, y_offset + 65)
         
         # Angle information
         y_pos = y_offset + 100
@@ -181,50 +267,142 @@ class RealTimeExerciseAnalyzer:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         y_pos += 25
         
-        for joint_name, angle in angles.items():
+        for joint_name, angle in feedback.angles.items():
             display_name = joint_name.replace('_', ' ').title()
             cv2.putText(frame, f"{display_name}: {angle:.1f}°", 
                        (x_offset + 10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.4, 
                        (200, 200, 200), 1)
             y_pos += 20
         
+        cv2.putText(frame, f"Reps: {feedback.rep_count}", 
+                   (x_offset + 10, y_offset + panel_height - 40), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
         # Average similarity (if available)
-        if len(self.similarity_buffer) > 5:
-            avg_similarity = np.mean(self.similarity_buffer[-30:])  # Last 30 frames
-            cv2.putText(frame, f"30-Frame Avg: {avg_similarity:.1f}%", 
+        if feedback.average_similarity is not None:
+            cv2.putText(frame, f"30-Frame Avg: {feedback.average_similarity:.1f}%", 
                        (x_offset + 10, y_offset + panel_height - 15), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
 
-    def analyze_real_time(self, template_id: str):
-        """Perform real-time analysis against a template"""
-        # Get template from API
+    def reset_session(self):
+        """Clear the per-session totals and start timing reps from now"""
+        with self._session_lock:
+            self.similarity_buffer = []
+            self.session_frames = 0
+            self.similarity_sum = 0.0
+            self.best_similarity = None
+            self.lowest_similarity = None
+            self.reps = RepDetector(CLIENT_JOINTS)
+            self.session_start = time.time()
+
+    def record_frame(self, similarity: float, angles: Dict[str, float]) -> FrameFeedback:
+        """Add one analyzed frame to the display window, the session totals and the rep detector.
+
+        Returns the panel contents for this frame, so rendering never reads the session state.
+        """
+        with self._session_lock:
+            self.similarity_buffer.append(similarity)
+            if len(self.similarity_buffer) > self.max_buffer_size:
+                self.similarity_buffer.pop(0)
+            
+            self.session_frames += 1
+            self.similarity_sum += similarity
+            self.best_similarity = similarity if self.best_similarity is None else max(self.best_similarity, similarity)
+            self.lowest_similarity = similarity if self.lowest_similarity is None else min(self.lowest_similarity, similarity)
+            
+            rep = self.reps.push([angles.get(joint, float('nan')) for joint in CLIENT_JOINTS],
+                                 similarity, time.time() - self.session_start)
+            feedback = FrameFeedback(
+                similarity=similarity,
+                average_similarity=(float(np.mean(self.similarity_buffer[-30:]))
+                                    if len(self.similarity_buffer) > 5 else None),
+                rep_count=len(self.reps.reps),
+                angles=dict(angles)
+            )
+        if rep is not None:
+            print(f"🔁 Rep {feedback.rep_count}: {rep.similarity:.1f}% similarity, "
+                  f"{rep.range_of_motion:.0f}° range, {rep.end_time - rep.start_time:.1f}s")
+        return feedback
+
+    def fetch_template(self, template_id: str) -> Optional[Dict]:
+        """Fetch a single template from the API"""
         try:
             response = requests.get(f"{self.api_url}/templates/{template_id}")
             if response.status_code != 200:
                 print(f"Error: Template {template_id} not found")
-                return
-            template = response.json()
+                return None
+            return response.json()
         except Exception as e:
             print(f"Error fetching template: {e}")
-            return
+            return None
+
+    def open_camera(self) -> Optional[cv2.VideoCapture]:
+        """Open the webcam with settings suited to real-time analysis"""
+        cap = cv2.VideoCapture(0)
+        if not cap.isOpened():
+            print("❌ Error: Could not access webcam")
+            return None
         
+        # Set camera properties for better performance
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        cap.set(cv2.CAP_PROP_FPS, 30)
+        return cap
+
+    def print_instructions(self, template: Dict):
         print(f"🏋️  Starting real-time analysis for: {template['name']}")
         print("📋 Instructions:")
         print("   - Position yourself similar to the template pose")
         print("   - Green = Excellent (85%+), Yellow = Good (70%+)")
         print("   - Orange = Needs Work (50%+), Red = Poor (<50%)")
         print("   - Press 'q' to quit, 's' to save session")
-        
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("❌ Error: Could not access webcam")
+
+    def session_summary(self) -> Dict:
+        """Session totals and per-rep results; its size does not grow with the frame count"""
+        with self._session_lock:
+            return {
+                "frames_analyzed": self.session_frames,
+                "average_similarity": round(self.similarity_sum / self.session_frames, 2) if self.session_frames else None,
+                "best_similarity": self.best_similarity,
+                "lowest_similarity": self.lowest_similarity,
+                **self.reps.summary()
+            }
+
+    def print_session_summary(self, elapsed_time: float):
+        summary = self.session_summary()
+        if summary["frames_analyzed"] > 0:
+            
+            print(f"\n📊 Session Summary:")
+            print(f"   Duration: {elapsed_time:.1f} seconds")
+            print(f"   Frames analyzed: {summary['frames_analyzed']}")
+            print(f"   Average similarity: {summary['average_similarity']:.1f}%")
+            print(f"   Best similarity: {summary['best_similarity']:.1f}%")
+            print(f"   Lowest similarity: {summary['lowest_similarity']:.1f}%")
+            print(f"   Reps: {summary['rep_count']}")
+            for rep in summary['reps']:
+                print(f"     #{rep['rep']}: {rep['similarity']:.1f}%, {rep['range_of_motion']:.0f}° range, "
+                      f"{rep['duration']:.1f}s ({rep['flexion_time']:.1f}s flexion / {rep['extension_time']:.1f}s extension)")
+
+    def analyze_real_time(self, template_id: str, pipelined: bool = True):
+        """Perform real-time analysis against a template"""
+        template = self.fetch_template(template_id)
+        if template is None:
             return
         
-        # Set camera properties for better performance
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        cap.set(cv2.CAP_PROP_FPS, 30)
+        self.print_instructions(template)
+        self.reset_session()
+        
+        cap = self.open_camera()
+        if cap is None:
+            return
         
+        if pipelined:
+            self._run_pipelined(cap, template_id, template)
+        else:
+            self._run_serial(cap, template_id, template)
+
+    def _run_serial(self, cap: cv2.VideoCapture, template_id: str, template: Dict):
+        """Capture, infer and render one frame at a time on the calling thread"""
         frame_count = 0
         start_time = time.time()
         
@@ -252,12 +430,10 @@ class RealTimeExerciseAnalyzer:
                     angles = self.calculate_joint_angles(landmarks)
                     
                     # Update buffers
-                    self.similarity_buffer.append(similarity)
-                    if len(self.similarity_buffer) > self.max_buffer_size:
-                        self.similarity_buffer.pop(0)
+                    feedback = self.record_frame(similarity, angles)
                     
                     # Draw feedback panel
-                    self.draw_feedback_panel(frame, similarity, angles)
+                    self.draw_feedback_panel(frame, feedback)
                     
                     # Main similarity display
                     color = self.get_similarity_color(similarity)
@@ -295,32 +471,119 @@ class RealTimeExerciseAnalyzer:
             cv2.destroyAllWindows()
             
             # Print session summary
-            if len(self.similarity_buffer) > 0:
-                avg_similarity = np.mean(self.similarity_buffer)
-                max_similarity = np.max(self.similarity_buffer)
-                min_similarity = np.min(self.similarity_buffer)
+            self.print_session_summary(time.time() - start_time)
+
+    def _run_pipelined(self, cap: cv2.VideoCapture, template_id: str, template: Dict):
+        """Run capture, inference and rendering as separate stages.
+        
+        Capture and inference each run on their own thread; rendering stays on the
+        calling thread because OpenCV windows must be driven from it. Stages hand
+        frames over through LatestFrameQueues, so a slow stage skips stale frames
+        instead of stalling the camera. The inference thread owns the session state
+        and hands the renderer an immutable FrameFeedback with each frame.
+        """
+        stop = threading.Event()
+        captured = LatestFrameQueue()
+        analyzed = LatestFrameQueue()
+        rates = {'capture': StageRate(), 'inference': StageRate(), 'render': StageRate()}
+        window_name = f'Real-time Analysis - {template["name"]}'
+        
+        def capture_stage():
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    stop.set()
+                    break
+                captured.put(cv2.flip(frame, 1))  # Mirror effect
+                rates['capture'].tick()
+        
+        def inference_stage():
+            while not stop.is_set():
+                frame = captured.get()
+                if frame is None:
+                    continue
                 
-                print(f"\n📊 Session Summary:")
-                print(f"   Duration: {elapsed_time:.1f} seconds")
-                print(f"   Frames analyzed: {len(self.similarity_buffer)}")
-                print(f"   Average similarity: {avg_similarity:.1f}%")
-                print(f"   Best similarity: {max_similarity:.1f}%")
-                print(f"   Lowest similarity: {min_similarity:.1f}%")
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = self.pose.process(rgb_frame)
+                
+                feedback = None
+                if results.pose_landmarks:
+                    landmarks = results.pose_landmarks.landmark
+                    feedback = self.record_frame(
+                        self.calculate_similarity(landmarks, template['landmarks']),
+                        self.calculate_joint_angles(landmarks)
+                    )
+                
+                analyzed.put((frame, results.pose_landmarks, feedback))
+                rates['inference'].tick()
+        
+        threads = [
+            threading.Thread(target=capture_stage, name="capture", daemon=True),
+            threading.Thread(target=inference_stage, name="inference", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        
+        start_time = time.time()
+        
+        try:
+            while not stop.is_set():
+                item = analyzed.get()
+                if item is None:
+                    continue
+                frame, pose_landmarks, feedback = item
+                
+                if feedback is not None:
+                    self.mp_draw.draw_landmarks(frame, pose_landmarks, self.mp_pose.POSE_CONNECTIONS)
+                    self.draw_feedback_panel(frame, feedback)
+                    
+                    color = self.get_similarity_color(feedback.similarity)
+                    cv2.putText(frame, f"Similarity: {feedback.similarity:.1f}%", 
+                               (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 3)
+                    cv2.putText(frame, f"Exercise: {template['name']}", 
+                               (20, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+                else:
+                    cv2.putText(frame, "No pose detected!", (20, 50), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                
+                # Per-stage throughput
+                elapsed_time = time.time() - start_time
+                cv2.putText(frame, 
+                           f"Capture: {rates['capture'].fps:.1f} | Inference: {rates['inference'].fps:.1f} | "
+                           f"Render: {rates['render'].fps:.1f} FPS | Dropped: {captured.dropped} | "
+                           f"Time: {elapsed_time:.1f}s",
+                           (20, frame.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 
+                           (255, 255, 255), 1)
+                
+                cv2.imshow(window_name, frame)
+                rates['render'].tick()
+                
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('s'):
+                    self.save_analysis_session(template_id)
+                
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=2.0)
+            cap.release()
+            cv2.destroyAllWindows()
+            
+            self.print_session_summary(time.time() - start_time)
 
     def save_analysis_session(self, template_id: str):
         """Save current analysis session"""
-        if not self.similarity_buffer:
+        summary = self.session_summary()
+        if not summary["frames_analyzed"]:
             print("❌ No data to save")
             return
         
         session_data = {
             "template_id": template_id,
             "timestamp": datetime.now().isoformat(),
-            "frame_similarities": self.similarity_buffer.copy(),
-            "average_similarity": np.mean(self.similarity_buffer),
-            "max_similarity": np.max(self.similarity_buffer),
-            "min_similarity": np.min(self.similarity_buffer),
-            "total_frames": len(self.similarity_buffer)
+            **summary
         }
         
         filename = f"session_{template_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -359,15 +622,14 @@ def main():
     
     # Display available templates
     print("\n📋 Available Templates:")
-    template_list = list(templates.items())
-    for i, (template_id, template) in enumerate(template_list):
-        print(f"   {i+1}. {template['name']} - {template.get('description', 'No description')}")
+    for i, template in enumerate(templates):
+        print(f"   {i+1}. {template['name']} - {template.get('description') or 'No description'}")
     
     # Template selection
     try:
-        choice = int(input(f"\nSelect template (1-{len(template_list)}): ")) - 1
-        if 0 <= choice < len(template_list):
-            template_id = template_list[choice][0]
+        choice = int(input(f"\nSelect template (1-{len(templates)}): ")) - 1
+        if 0 <= choice < len(templates):
+            template_id = templates[choice]['id']
             analyzer.analyze_real_time(template_id)
         else:
             print("❌ Invalid selection")
@@ -375,5 +637,4 @@ def main():
         print("❌ Invalid input")
 
 if __name__ == "__main__":
-    import os
     main()
\ No newline at end of file
@@ -8,74 +8,83 @@ from typing import List, Dict, Optional
 import requests
 from pathlib import Path
 
+NUM_LANDMARKS = 33  # MediaPipe Pose landmarks
+LANDMARK_FIELDS = 4  # x, y, z, visibility
+
+def landmark_dicts(landmarks: np.ndarray) -> List[Dict[str, float]]:
+    """(33, 4) landmark array -> the list of dicts used in template JSON"""
+    return [
+        {"x": float(x), "y": float(y), "z": float(z), "visibility": float(v)}
+        for x, y, z, v in landmarks.tolist()
+    ]
+
 class EnhancedTemplateGenerator:
     def __init__(self):
         self.mp_pose = mp.solutions.pose
         self.mp_draw = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5,
-            model_complexity=2
-        )
+        self._pose = None  # created on first capture; the frame helpers below do not need a model
         
         # Quality metrics
         self.quality_thresholds = {
             'min_visibility': 0.7,
             'stability_threshold': 0.05,  # Max allowed variation
             'min_frames': 30,  # Minimum frames for good template
-            'max_frames': 300  # Maximum frames to prevent too much data
+            'max_frames': 300,  # Maximum frames to prevent too much data
+            'max_keyframes': 200  # Keyframes kept for DTW scoring of the movement
         }
         
-        self.landmarks_buffer = []
+        # Landmarks of every captured frame with a pose, filled in place during capture
+        self.landmarks_buffer = np.empty(
+            (self.quality_thresholds['max_frames'], NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32
+        )
         self.frame_count = 0
 
-    def calculate_landmark_stability(self, landmarks_history: List[List]) -> float:
-        """Calculate how stable the pose is across frames"""
+    @property
+    def pose(self):
+        if self._pose is None:
+            self._pose = self.mp_pose.Pose(
+                static_image_mode=False,
+                min_detection_confidence=0.7,
+                min_tracking_confidence=0.5,
+                model_complexity=2
+            )
+        return self._pose
+
+    def calculate_landmark_stability(self, landmarks_history: np.ndarray) -> float:
+        """Calculate how stable the pose is across a (frames, 33, 4) landmark array"""
         if len(landmarks_history) < 10:
             return 0.0
         
-        stabilities = []
-        for landmark_idx in range(33):  # MediaPipe has 33 landmarks
-            positions = []
-            for frame_landmarks in landmarks_history:
-                if landmark_idx < len(frame_landmarks):
-                    landmark = frame_landmarks[landmark_idx]
-                    positions.append([landmark['x'], landmark['y'], landmark['z']])
-            
-            if len(positions) > 5:
-                positions = np.array(positions)
-                std_dev = np.std(positions, axis=0)
-                stability = 1.0 - np.mean(std_dev)  # Higher stability = lower std dev
-                stabilities.append(max(0, stability))
-        
-        return np.mean(stabilities) if stabilities else 0.0
+        # Per landmark: 1 - mean positional std dev over frames (higher = steadier), floored at 0
+        std_dev = landmarks_history[:, :, :3].std(axis=0, dtype=np.float64)
+        return float(np.maximum(0.0, 1.0 - std_dev.mean(axis=1)).mean())
 
-    def filter_quality_frames(self, all_landmarks: List[List]) -> List[List]:
-        """Filter frames based on pose quality and stability"""
-        quality_frames = []
-        
-        for i, frame_landmarks in enumerate(all_landmarks):
-            # Check visibility threshold
-            visible_count = sum(1 for lm in frame_landmarks if lm['visibility'] >= self.quality_thresholds['min_visibility'])
-            visibility_ratio = visible_count / len(frame_landmarks)
-            
-            if visibility_ratio >= 0.8:  # At least 80% landmarks should be visible
-                quality_frames.append(frame_landmarks)
-        
-        return quality_frames
+    def filter_quality_frames(self, all_landmarks: np.ndarray) -> np.ndarray:
+        """Keep the frames of a (frames, 33, 4) array where at least 80% of landmarks are visible"""
+        visible = all_landmarks[:, :, 3] >= self.quality_thresholds['min_visibility']
+        return all_landmarks[visible.mean(axis=1) >= 0.8]
+
+    def select_keyframes(self, quality_frames: np.ndarray) -> np.ndarray:
+        """Downsample the quality frames evenly to at most max_keyframes poses"""
+        max_keyframes = self.quality_thresholds['max_keyframes']
+        if len(quality_frames) <= max_keyframes:
+            return quality_frames
+        indices = np.round(np.linspace(0, len(quality_frames) - 1, max_keyframes)).astype(int)
+        return quality_frames[indices]
 
     def create_template_with_metadata(self, landmarks: List[Dict], exercise_name: str, 
-                                    description: str = "") -> Dict:
+                                    description: str = "", keyframes: Optional[List[List]] = None) -> Dict:
         """Create template with additional metadata"""
         return {
             "name": exercise_name,
             "description": description,
             "created_at": datetime.now().isoformat(),
             "landmarks": landmarks,
+            "keyframes": keyframes,
             "metadata": {
                 "total_frames_captured": self.frame_count,
                 "quality_frames_used": len(landmarks),
+                "keyframes": len(keyframes) if keyframes else 0,
                 "average_visibility": np.mean([lm['visibility'] for lm in landmarks]),
                 "generation_method": "enhanced_webcam_capture"
             }
@@ -98,7 +107,8 @@ class EnhancedTemplateGenerator:
             print("❌ Error: Could not access webcam")
             return None
         
-        all_landmarks = []
+        buffer = self.landmarks_buffer
+        captured = 0  # frames with a pose written to the buffer
         start_time = cv2.getTickCount()
         fps = cap.get(cv2.CAP_PROP_FPS) or 30
         total_frames_needed = int(capture_duration * fps)
@@ -111,13 +121,10 @@ class EnhancedTemplateGenerator:
                 if not ret:
                     break
                 
-                # Flip frame horizontally for mirror effect
-                frame = cv2.flip(frame, 1)
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = self.pose.process(rgb_frame)
-                
-                # Display frame with pose landmarks
-                display_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+                # Flip frame horizontally for mirror effect; the flipped BGR frame is
+                # also the display frame, so only the RGB copy for inference is made
+                display_frame = cv2.flip(frame, 1)
+                results = self.pose.process(cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB))
                 
                 if results.pose_landmarks:
                     # Draw pose landmarks
@@ -126,20 +133,16 @@ class EnhancedTemplateGenerator:
                         self.mp_pose.POSE_CONNECTIONS
                     )
                     
-                    # Extract landmarks
-                    frame_landmarks = []
-                    for landmark in results.pose_landmarks.landmark:
-                        frame_landmarks.append({
-                            "x": float(landmark.x),
-                            "y": float(landmark.y),
-                            "z": float(landmark.z),
-                            "visibility": float(landmark.visibility)
-                        })
-                    
-                    all_landmarks.append(frame_landmarks)
+                    # Extract landmarks straight into the capture buffer
+                    frame_landmarks = buffer[captured]
+                    frame_landmarks[:] = [
+                        (landmark.x, landmark.y, landmark.z, landmark.visibility)
+                        for landmark in results.pose_landmarks.landmark
+                    ]
+                    captured += 1
                     
                     # Quality indicator
-                    visible_landmarks = sum(1 for lm in frame_landmarks if lm['visibility'] >= 0.7)
+                    visible_landmarks = int(np.count_nonzero(frame_landmarks[:, 3] >= 0.7))
                     quality_color = (0, 255, 0) if visible_landmarks >= 25 else (0, 165, 255)
                     cv2.putText(display_frame, f"Quality: {visible_landmarks}/33", 
                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, quality_color, 2)
@@ -148,7 +151,7 @@ class EnhancedTemplateGenerator:
                 progress = (self.frame_count / total_frames_needed) * 100
                 cv2.putText(display_frame, f"Progress: {progress:.1f}%", 
                           (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(display_frame, f"Frames: {len(all_landmarks)}", 
+                cv2.putText(display_frame, f"Frames: {captured}", 
                           (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                 
                 cv2.imshow('Template Capture - Press q to stop, ESC to cancel', display_frame)
@@ -163,18 +166,22 @@ class EnhancedTemplateGenerator:
                 
                 self.frame_count += 1
                 
+                if captured == len(buffer):
+                    print(f"🛑 Reached the {len(buffer)}-frame limit")
+                    break
+                
         finally:
             cap.release()
             cv2.destroyAllWindows()
         
-        if len(all_landmarks) < self.quality_thresholds['min_frames']:
-            print(f"⚠️  Warning: Only captured {len(all_landmarks)} frames (minimum {self.quality_thresholds['min_frames']})")
+        if captured < self.quality_thresholds['min_frames']:
+            print(f"⚠️  Warning: Only captured {captured} frames (minimum {self.quality_thresholds['min_frames']})")
             return None
         
-        print(f"✅ Captured {len(all_landmarks)} frames")
+        print(f"✅ Captured {captured} frames")
         
         # Filter quality frames
-        quality_frames = self.filter_quality_frames(all_landmarks)
+        quality_frames = self.filter_quality_frames(buffer[:captured])
         print(f"📊 Quality frames after filtering: {len(quality_frames)}")
         
         if len(quality_frames) < self.quality_thresholds['min_frames']:
@@ -186,33 +193,33 @@ class EnhancedTemplateGenerator:
         print(f"📈 Pose stability score: {stability:.3f}")
         
         # Average the landmarks
-        averaged_landmarks = []
-        landmarks_array = np.array([[lm for lm in frame] for frame in quality_frames])
+        averaged_landmarks = self.average_landmarks(quality_frames)
         
-        for landmark_idx in range(33):
-            landmark_data = landmarks_array[:, landmark_idx]
-            
-            # Calculate weighted average (higher visibility = higher weight)
-            weights = np.array([lm['visibility'] for lm in landmark_data])
-            weights = weights / np.sum(weights) if np.sum(weights) > 0 else np.ones_like(weights) / len(weights)
-            
-            avg_landmark = {
-                "x": float(np.average([lm['x'] for lm in landmark_data], weights=weights)),
-                "y": float(np.average([lm['y'] for lm in landmark_data], weights=weights)),
-                "z": float(np.average([lm['z'] for lm in landmark_data], weights=weights)),
-                "visibility": float(np.average([lm['visibility'] for lm in landmark_data], weights=weights))
-            }
-            averaged_landmarks.append(avg_landmark)
+        # Keep the movement itself as a keyframe sequence; the averaged pose stays
+        # the static reference used for live feedback
+        keyframes = self.select_keyframes(quality_frames)
+        print(f"🎞️  Keyframes kept for movement scoring: {len(keyframes)}")
         
         # Create template with metadata
         template = self.create_template_with_metadata(
-            averaged_landmarks, exercise_name, description
+            averaged_landmarks, exercise_name, description, [landmark_dicts(keyframe) for keyframe in keyframes]
         )
         template['metadata']['stability_score'] = stability
         
         print("✅ Template generated successfully!")
         return template
 
+    def average_landmarks(self, quality_frames: np.ndarray) -> List[Dict]:
+        """Visibility-weighted average of every landmark over a (frames, 33, 4) array"""
+        # Higher visibility = higher weight; a landmark never seen falls back to a plain mean
+        weights = quality_frames[:, :, 3].astype(np.float64)
+        totals = weights.sum(axis=0)
+        unseen = totals <= 0
+        weights[:, unseen] = 1.0
+        totals[unseen] = len(quality_frames)
+        averaged = np.einsum("fl,flc->lc", weights, quality_frames) / totals[:, None]
+        return landmark_dicts(averaged)
+
     def save_template_locally(self, template: Dict, filename: str = None) -> str:
         """Save template to local file"""
         os.makedirs("templates", exist_ok=True)
@@ -1,6 +1,24 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Request, Query, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from api_config import get_settings
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from api_config import DIFFICULTY_LEVELS, get_settings
+from scoring_engine import (
+    NUM_LANDMARKS, CompiledTemplate, JointErrorAggregator, LandmarkTrackBuilder, PoseScoringEngine,
+    build_landmark_weights, landmarks_to_array
+)
+from template_store import StoredTemplate, TemplateStore
+from storage import create_storage
+from analysis_record import AnalysisRecord
+from live_scoring import LatestFrameSlot, LiveScoringSession, decode_landmark_frames
+from rep_detection import RepDetector, rep_array
+from metrics import MetricsRegistry, StageTimer
+from profiling import ProfileStore, Profiler, ProfilerBusyError, run_profiled
+from job_queue import AnalysisJob, AnalysisJobQueue, JOB_COMPLETED, JOB_FAILED
+from video_pipeline import (
+    FramePreprocessor, PoseTrack, frame_stride, infer_encoded_frame, load_or_extract_pose_track
+)
+from pose_pool import PosePool, PoolExhaustedError
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Tuple
 import cv2
@@ -9,9 +27,16 @@ import numpy as np
 import json
 import os
 import asyncio
+import aiofiles
+import functools
+import hashlib
+import hmac
 import logging
+import time
 from datetime import datetime
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 import base64
 
@@ -21,12 +46,67 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    load_started = datetime.now()
+    count = template_store.load()
+    logger.info(f"Loaded {count} templates in {(datetime.now() - load_started).total_seconds():.3f}s")
+    job_queue.start()
+    yield
+    job_queue.shutdown()
+    live_inference_executor.shutdown(wait=False)
+    pose_pool.close()
+    storage_backend.close()
+
 app = FastAPI(
     title=settings.app_name,
     description="AI-powered exercise form analysis using MediaPipe",
-    version=settings.app_version
+    version=settings.app_version,
+    lifespan=lifespan
 )
 
+class UploadSizeLimitMiddleware:
+    """Refuse video uploads over max_video_size_mb while they are still arriving.
+
+    A declared Content-Length over the limit is rejected before the body is read.
+    Otherwise (including chunked uploads without one) the body is counted as the
+    app receives it, and parsing stops with 413 as soon as the limit is crossed,
+    before Starlette has spooled the rest of the multipart body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not scope["path"].startswith("/analyze/video")):
+            await self.app(scope, receive, send)
+            return
+        
+        limit = max_upload_bytes()
+        detail = f"Video exceeds {settings.max_video_size_mb} MB limit"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def receive_within_limit():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing; FastAPI passes HTTPExceptions through as responses
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, receive_within_limit, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS middleware (driven by api_config settings)
 app.add_middleware(
     CORSMiddleware,
@@ -50,26 +130,58 @@ class ExerciseTemplate(BaseModel):
     name: str
     description: Optional[str] = None
     landmarks: List[LandmarkData]
+    keyframes: Optional[List[List[LandmarkData]]] = None  # pose sequence of a movement template
     created_at: Optional[datetime] = None
     
+class JointErrorStats(BaseModel):
+    minor: int
+    moderate: int
+    critical: int
+    worst_deviation: float
+    mean_deviation: float
+    time_in_error: float = 0.0
+
+class RepResult(BaseModel):
+    rep: int
+    start_time: float
+    end_time: float
+    duration: float
+    frames: int
+    similarity: float
+    range_of_motion: float
+    flexion_time: float
+    extension_time: float
+
 class AnalysisResult(BaseModel):
     session_id: str
     overall_similarity: float
-    frame_similarities: List[float]
+    scored_frames: int
+    rep_count: int = 0
+    rep_joint: Optional[str] = None
+    reps: List[RepResult] = []
     joint_errors: Dict[str, List[str]]
+    joint_stats: Dict[str, JointErrorStats] = {}
+    difficulty: Optional[str] = None
     recommendations: List[str]
     analysis_duration: float
+    stage_durations: Dict[str, float] = {}
     total_frames: int
+    sampled_frames: int
+
+class TemplateMatch(BaseModel):
+    template_id: str
+    name: str
+    overall_similarity: float
+    session_id: str
+
+class MultiTemplateAnalysisResult(BaseModel):
+    job_id: str
+    best_template_id: str
+    ranking: List[TemplateMatch]
+    results: Dict[str, AnalysisResult]
 
 class ExerciseAnalyzer:
     def __init__(self):
-        self.pose = mp_pose.Pose(
-            static_image_mode=False,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5,
-            model_complexity=2
-        )
-        
         # MediaPipe landmark indices for key joints
         self.joint_connections = {
             'left_elbow': (11, 13, 15),    # shoulder, elbow, wrist
@@ -82,13 +194,13 @@ class ExerciseAnalyzer:
             'right_hip': (12, 24, 26),
         }
         
-        # Angle thresholds for different joints
-        self.angle_thresholds = {
-            'elbow': {'min': 30, 'max': 170, 'tolerance': 15},
-            'shoulder': {'min': 0, 'max': 180, 'tolerance': 20},
-            'knee': {'min': 0, 'max': 170, 'tolerance': 15},
-            'hip': {'min': 45, 'max': 135, 'tolerance': 20}
-        }
+        # Angle thresholds and landmark weights for different joints (see api_config)
+        self.angle_thresholds = settings.joint_angle_tolerances
+        self.engine = PoseScoringEngine(
+            self.joint_connections,
+            self.angle_thresholds,
+            build_landmark_weights(**settings.landmark_weights)
+        )
 
     def calculate_angle(self, p1, p2, p3):
         """Calculate angle between three points"""
@@ -121,127 +233,419 @@ class ExerciseAnalyzer:
         if len(student_landmarks) != len(template_landmarks):
             return 0.0
         
-        # Weight different body parts differently
-        weights = {
-            # Face landmarks (0-10) - lower weight
-            **{i: 0.3 for i in range(11)},
-            # Upper body landmarks (11-22) - high weight
-            **{i: 1.5 for i in range(11, 23)},
-            # Lower body landmarks (23-32) - highest weight for exercise
-            **{i: 2.0 for i in range(23, 33)}
-        }
-        
-        total_similarity = 0.0
-        total_weight = 0.0
-        
-        for i, (student, template) in enumerate(zip(student_landmarks, template_landmarks)):
-            if student.visibility < 0.5 or template.visibility < 0.5:
-                continue
-                
-            weight = weights.get(i, 1.0)
-            
-            # Calculate 3D distance
-            distance = self.calculate_3d_distance(student, template)
-            
-            # Convert distance to similarity (0-1 scale)
-            similarity = max(0, 1 - distance)
-            
-            total_similarity += similarity * weight
-            total_weight += weight
-        
-        return (total_similarity / total_weight * 100) if total_weight > 0 else 0.0
+        track = landmarks_to_array(student_landmarks)[None]
+        template = self.engine.compile_template(landmarks_to_array(template_landmarks))
+        return float(self.engine.frame_similarities(track, template)[0])
 
     def analyze_joint_angles(self, landmarks, template_landmarks) -> Dict[str, List[str]]:
         """Analyze joint angles and provide feedback"""
-        errors = {
-            'critical': [],
-            'moderate': [],
-            'minor': []
-        }
-        
         try:
-            for joint_name, (p1_idx, p2_idx, p3_idx) in self.joint_connections.items():
-                if (p1_idx < len(landmarks) and p2_idx < len(landmarks) and 
-                    p3_idx < len(landmarks)):
-                    
-                    # Calculate current angle
-                    current_angle = self.calculate_angle(
-                        landmarks[p1_idx], landmarks[p2_idx], landmarks[p3_idx]
-                    )
-                    
-                    # Calculate template angle
-                    template_angle = self.calculate_angle(
-                        template_landmarks[p1_idx], template_landmarks[p2_idx], 
-                        template_landmarks[p3_idx]
-                    )
-                    
-                    angle_diff = abs(current_angle - template_angle)
-                    
-                    # Determine joint type for threshold
-                    joint_type = joint_name.split('_')[1] if '_' in joint_name else 'shoulder'
-                    threshold = self.angle_thresholds.get(joint_type, self.angle_thresholds['shoulder'])
-                    
-                    if angle_diff > threshold['tolerance'] * 2:
-                        errors['critical'].append(f"{joint_name}: {angle_diff:.1f}° deviation (critical)")
-                    elif angle_diff > threshold['tolerance']:
-                        errors['moderate'].append(f"{joint_name}: {angle_diff:.1f}° deviation (moderate)")
-                    elif angle_diff > threshold['tolerance'] * 0.5:
-                        errors['minor'].append(f"{joint_name}: {angle_diff:.1f}° deviation (minor)")
-                        
+            track = landmarks_to_array(landmarks)[None]
+            template = self.engine.compile_template(landmarks_to_array(template_landmarks))
+            deviations = self.engine.joint_deviations(track, template)
+            return self.engine.render_joint_errors(deviations, self.engine.classify_deviations(deviations, template))
         except Exception as e:
             logger.error(f"Error analyzing joint angles: {e}")
-            
-        return errors
+            return {'critical': [], 'moderate': [], 'minor': []}
+
+    def new_rep_detector(self, template: CompiledTemplate) -> RepDetector:
+        """Rep detector for a template; movement templates fix the joint that moves the most"""
+        driving_joint = None
+        if template.sequence is not None and len(template.sequence.joint_angles) > 1:
+            with np.errstate(invalid='ignore'):
+                swing = np.nanmax(template.sequence.joint_angles, axis=0) - np.nanmin(template.sequence.joint_angles, axis=0)
+            if np.any(swing >= settings.rep_min_range_degrees):
+                driving_joint = int(np.nanargmax(swing))
+        return RepDetector(self.engine.joint_names, settings.rep_min_range_degrees,
+                           settings.rep_smoothing, driving_joint)
+    
+    def score_track(self, track: np.ndarray, template: CompiledTemplate,
+                    tolerance_multiplier: float = 1.0,
+                    fps: float = 0.0,
+                    frame_times: Optional[np.ndarray] = None) -> Tuple[np.ndarray, JointErrorAggregator, RepDetector]:
+        """Score a whole (frames, 33, 4) landmark track against a compiled template.
+        
+        Movement templates are scored frame by frame against the keyframe each frame
+        is aligned to by DTW; static templates against their single pose.
+        Returns the per-frame similarities, the aggregated per-joint errors and the
+        reps detected from the joint angles. Reps are timed with ``frame_times`` (seconds
+        into the video of each frame) when given, otherwise at ``fps`` frames per second.
+        """
+        errors = JointErrorAggregator(self.engine, template, tolerance_multiplier)
+        angles = self.engine.joint_angles(track)
+        if template.sequence is not None:
+            similarities, deviations = self.engine.sequence_scores(
+                track, template.sequence, settings.dtw_max_step_ratio
+            )
+        else:
+            similarities = self.engine.frame_similarities(track, template)
+            deviations = np.abs(angles - template.joint_angles)
+        errors.update(deviations)
+        
+        # Occluded joints jitter; leave them out of rep detection
+        reps = self.new_rep_detector(template)
+        reps.update(np.where(self.engine.joints_visible(track), angles, np.nan), similarities,
+                    frame_times if frame_times is not None
+                    else np.arange(len(track)) / (fps or settings.default_capture_fps))
+        return similarities, errors, reps
 
-    def generate_recommendations(self, similarity: float, joint_errors: Dict[str, List[str]]) -> List[str]:
+    def generate_recommendations(self, similarity: float, errors: JointErrorAggregator,
+                                 difficulty: Optional[Dict] = None) -> List[str]:
         """Generate personalized recommendations based on analysis"""
         recommendations = []
         
-        if similarity < 60:
+        # Difficulty levels move the bar: below their threshold is "good effort"
+        if difficulty is None:
+            poor_below, good_below = 60, 80
+        else:
+            good_below = difficulty["similarity_threshold"]
+            poor_below = good_below - 20
+        
+        if similarity < poor_below:
             recommendations.append("🚨 Overall form needs significant improvement. Consider slowing down and focusing on proper technique.")
-        elif similarity < 80:
+        elif similarity < good_below:
             recommendations.append("⚠️ Good effort! Focus on the specific joint corrections mentioned below.")
         else:
             recommendations.append("✅ Excellent form! Keep up the great work.")
         
         # Add specific recommendations based on errors
-        if joint_errors['critical']:
+        if errors.severity_counts[:, -1].any():
             recommendations.append("🔴 Critical issues detected - these could lead to injury if not corrected.")
         
-        if 'elbow' in str(joint_errors):
+        flagged_types = {name.split('_')[-1] for name in errors.flagged_joints()}
+        
+        if 'elbow' in flagged_types:
             recommendations.append("💪 Focus on elbow positioning - keep them aligned with your shoulders.")
             
-        if 'knee' in str(joint_errors):
+        if 'knee' in flagged_types:
             recommendations.append("🦵 Pay attention to knee alignment - avoid inward collapse.")
             
-        if 'shoulder' in str(joint_errors):
+        if 'shoulder' in flagged_types:
             recommendations.append("🏋️ Maintain proper shoulder posture throughout the movement.")
         
+        if flagged_types:
+            time_in_error = errors.time_in_error
+            worst_joint = int(np.argmax(time_in_error))
+            recommendations.append(
+                f"📍 {errors.joint_names[worst_joint].replace('_', ' ').capitalize()} was out of tolerance "
+                f"in {time_in_error[worst_joint] * 100:.0f}% of frames - start there."
+            )
+        
         return recommendations
 
-# Global analyzer instance
+# Global analyzer instance (stateless scoring only; pose estimators come from pose_pool)
 analyzer = ExerciseAnalyzer()
 
-# In-memory storage (replace with database in production)
-exercise_templates: Dict[str, ExerciseTemplate] = {}
-analysis_sessions: Dict[str, AnalysisResult] = {}
+# Pose instances are stateful trackers, so each analysis checks one out exclusively
+pose_pool = PosePool(max_per_key=settings.pose_pool_size)
+
+# Threads for live frame decoding and inference (MediaPipe releases the GIL while it runs)
+live_inference_executor = ThreadPoolExecutor(max_workers=settings.pose_pool_size + 1)
+
+# Templates and sessions live in the configured backend (settings.database_url);
+# with SQLite every worker process shares them. Templates are cached in memory.
+storage_backend = create_storage(
+    settings.database_url, settings.templates_dir, settings.sessions_dir,
+    session_memory_bytes=settings.session_cache_max_mb * 1024 * 1024 if settings.enable_caching else 0,
+    session_ttl_seconds=settings.cache_ttl_seconds
+)
+template_store = TemplateStore(storage_backend, settings.templates_dir,
+                               compiler=analyzer.engine.compile_templates,
+                               sequence_compiler=analyzer.engine.with_sequence)
+
+def persist_job(job: AnalysisJob):
+    now = time.time()
+    storage_backend.put_job(job.job_id, json.dumps(jsonable_encoder(job)), now)
+    if job.finished_at is not None:
+        expired = storage_backend.expire_jobs(now - settings.job_ttl_seconds)
+        if expired:
+            logger.info(f"Expired {expired} analysis jobs")
+
+def lookup_job(job_id: str) -> Optional[AnalysisJob]:
+    data = storage_backend.get_job(job_id)
+    return AnalysisJob(**json.loads(data)) if data is not None else None
+
+# Video analysis runs on a process pool so uploads never block the event loop.
+# Job records are kept in the storage backend too, so any worker can serve /jobs/...
+job_queue = AnalysisJobQueue(max_workers=settings.max_concurrent_analyses,
+                             persist=persist_job, lookup=lookup_job)
+
+# Process-local metrics served at /metrics; each API worker process reports its own
+metrics_registry = MetricsRegistry()
+stage_seconds = metrics_registry.histogram(
+    "exercise_analysis_stage_seconds", "Time an analysis spent in each pipeline stage", ["stage"]
+)
+frames_processed = metrics_registry.counter(
+    "exercise_frames_processed_total", "Frames run through pose inference or scoring", ["source"]
+)
+frames_without_pose = metrics_registry.counter(
+    "exercise_frames_without_pose_total", "Analyzed frames in which no pose was found", ["source"]
+)
+live_frames_dropped = metrics_registry.counter(
+    "exercise_live_frames_dropped_total", "Live frames replaced by a newer one before inference"
+)
+pose_track_cache_lookups = metrics_registry.counter(
+    "exercise_pose_track_cache_total", "Video analyses by pose track cache result", ["result"]
+)
+jobs_finished = metrics_registry.counter("exercise_jobs_total", "Finished video analysis jobs", ["status"])
+metrics_registry.callback("exercise_jobs_queued", "Video analysis jobs waiting for a worker",
+                 lambda: job_queue.queue_depth)
+metrics_registry.callback("exercise_jobs_running", "Video analysis jobs being processed", lambda: job_queue.running)
+metrics_registry.callback("exercise_templates", "Templates loaded", lambda: len(template_store))
+metrics_registry.callback("exercise_sessions", "Stored analysis sessions", lambda: storage_backend.session_count())
+metrics_registry.callback("exercise_session_storage", "Session storage counters (cache hits, misses, spills...)",
+                 lambda: storage_backend.stats(), labelname="stat")
+metrics_registry.callback("exercise_pose_pool", "Pose estimators created and idle in this process",
+                 lambda: pose_pool.stats(), labelname="state")
+
+def record_frame_counts(source: str, sampled_frames: int, pose_frames: int):
+    frames_processed.inc(sampled_frames, source=source)
+    frames_without_pose.inc(sampled_frames - pose_frames, source=source)
+
+def record_stage_durations(stage_durations: Dict[str, float]):
+    for stage, seconds in stage_durations.items():
+        stage_seconds.observe(seconds, stage=stage)
+
+# Reports of requests profiled on demand with ?profile=true (admin only)
+profile_store = ProfileStore(os.path.join(settings.logs_dir, "profiles"))
+PROFILE_HEADER = "X-Profile-Id"
+
+def require_admin(admin_token: Optional[str]):
+    """Allow the request only if it carries settings.admin_token as X-Admin-Token"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin features are disabled; set ADMIN_TOKEN to enable them")
+    if admin_token is None or not hmac.compare_digest(admin_token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def save_profile(profile_id: str, endpoint: str, sections: Dict[str, dict], error: Optional[str] = None):
+    try:
+        profile_store.save(profile_id, endpoint, sections, error)
+        logger.info(f"Saved profile {profile_id} for {endpoint}")
+    except OSError as e:
+        logger.warning(f"Could not save profile {profile_id}: {e}")
+
+def call_profiled(endpoint: str, requested: bool, admin_token: Optional[str], response: Response,
+                  handler, *args):
+    """Run ``handler(*args)``, under a Profiler when an admin asked for it with ``profile=true``.
+
+    The report id is returned in the X-Profile-Id header. Unprofiled requests call
+    the handler directly. This runs on the event loop, so while another profile is
+    running in this worker the request gets 409 instead of waiting for it.
+    """
+    if not requested:
+        return handler(*args)
+    require_admin(admin_token)
+    
+    profile_id = profile_store.new_id()
+    profiler = Profiler(settings.profile_top_entries, wait=False)
+    try:
+        with profiler:
+            result = handler(*args)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409, detail="Another profile is running in this worker; retry shortly")
+    except Exception as e:
+        save_profile(profile_id, endpoint, {"request": profiler.report()}, str(getattr(e, "detail", e)))
+        raise
+    save_profile(profile_id, endpoint, {"request": profiler.report()})
+    
+    headers = result.headers if isinstance(result, Response) else response.headers
+    headers[PROFILE_HEADER] = profile_id
+    return result
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+def max_upload_bytes() -> int:
+    return settings.max_video_size_mb * 1024 * 1024
+
+def temp_video_path(session_id: str, filename: Optional[str]) -> Path:
+    """Location under settings.temp_dir where an upload is spooled for analysis"""
+    suffix = Path(filename or "").suffix or ".mp4"
+    return Path(settings.temp_dir) / f"{session_id}{suffix}"
+
+def remove_temp_file(path: Path):
+    """Delete a temp file, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove temp file {path}: {e}")
+
+async def save_upload(upload: UploadFile, destination: Path) -> str:
+    """Copy an upload to disk in chunks, enforcing settings.max_video_size_mb.
+
+    UploadSizeLimitMiddleware has already cut off oversized bodies while they were
+    received; the check here covers the size of the file part itself.
+
+    Returns the SHA-256 hex digest of the content, used to key the pose track cache.
+    """
+    limit = max_upload_bytes()
+    if upload.size is not None and upload.size > limit:
+        raise HTTPException(status_code=413, detail=f"Video exceeds {settings.max_video_size_mb} MB limit")
+    
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+    async with aiofiles.open(destination, "wb") as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > limit:
+                raise HTTPException(status_code=413, detail=f"Video exceeds {settings.max_video_size_mb} MB limit")
+            digest.update(chunk)
+            await f.write(chunk)
+    return digest.hexdigest()
+
+def inference_long_edge(requested: Optional[int]) -> Optional[int]:
+    """Resolve the inference resolution for a request; 0 means full resolution"""
+    if requested is None:
+        return settings.inference_max_long_edge
+    return requested or None
+
+def pose_track_loader(video_path: str, content_digest: str, target_fps: Optional[float],
+                      max_long_edge: Optional[int]):
+    """Picklable job callable that returns the (possibly cached) pose track of a video"""
+    return functools.partial(
+        load_or_extract_pose_track,
+        video_path,
+        content_digest,
+        cache_dir=settings.pose_cache_dir,
+        cache_max_bytes=settings.pose_cache_max_mb * 1024 * 1024,
+        model_complexity=settings.model_complexity,
+        min_detection_confidence=settings.min_detection_confidence,
+        min_tracking_confidence=settings.min_tracking_confidence,
+        target_fps=target_fps or settings.analysis_target_fps,
+        default_fps=settings.default_capture_fps,
+        max_long_edge=inference_long_edge(max_long_edge)
+    )
+
+def to_exercise_template(stored: StoredTemplate) -> ExerciseTemplate:
+    """Materialize a stored template as the API model"""
+    return ExerciseTemplate(
+        name=stored.name,
+        description=stored.description,
+        landmarks=stored.landmark_dicts(),
+        keyframes=stored.keyframe_dicts(),
+        created_at=stored.created_at
+    )
+
+def difficulty_level(difficulty: Optional[str]) -> Optional[Dict]:
+    """Look up a DIFFICULTY_LEVELS entry; None keeps the default tolerances"""
+    if difficulty is None:
+        return None
+    if difficulty not in DIFFICULTY_LEVELS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown difficulty '{difficulty}', expected one of: {', '.join(DIFFICULTY_LEVELS)}"
+        )
+    return DIFFICULTY_LEVELS[difficulty]
+
+def build_analysis_record(session_id: str, track: np.ndarray, template: CompiledTemplate,
+                          frame_count: int, sampled_frames: int, start_time: datetime,
+                          difficulty: Optional[str] = None, fps: float = 0.0,
+                          stage_durations: Optional[Dict[str, float]] = None,
+                          frame_times: Optional[np.ndarray] = None) -> AnalysisRecord:
+    """Score a collected landmark track and keep it in compact form.
+
+    ``stage_durations`` holds the time already spent on the track (upload, decode,
+    pose...); the scoring time is added to it. ``frame_times`` places each frame in
+    the video, so frames skipped by the stride or without a pose do not shorten reps.
+    """
+    level = difficulty_level(difficulty)
+    timer = StageTimer()
+    with timer.stage("scoring"):
+        similarities, errors, reps = analyzer.score_track(
+            track, template, level["angle_tolerance_multiplier"] if level else 1.0, fps, frame_times
+        )
+    record_stage_durations(timer.durations)
+    overall_similarity = float(np.mean(similarities)) if len(similarities) else 0.0
+    
+    return AnalysisRecord(
+        session_id, analyzer.engine.joint_names, len(similarities), overall_similarity,
+        rep_array(reps.reps), reps.joint, errors.severity_counts, errors.worst_deviation, errors.mean_deviation, errors.error_frames,
+        recommendations=analyzer.generate_recommendations(overall_similarity, errors, level),
+        analysis_duration=(datetime.now() - start_time).total_seconds(),
+        total_frames=frame_count,
+        sampled_frames=sampled_frames,
+        difficulty=difficulty,
+        stage_durations={**(stage_durations or {}), **timer.durations}
+    )
+
+def to_analysis_result(record: AnalysisRecord) -> AnalysisResult:
+    """Render a stored analysis as the API model"""
+    return AnalysisResult(
+        session_id=record.session_id,
+        overall_similarity=record.overall_similarity,
+        scored_frames=record.scored_frames,
+        rep_count=len(record.reps),
+        rep_joint=record.rep_joint,
+        reps=record.rep_summary(),
+        joint_errors=record.joint_error_summary(),
+        joint_stats=record.joint_stats(),
+        difficulty=record.difficulty,
+        recommendations=record.recommendations,
+        analysis_duration=record.analysis_duration,
+        stage_durations={stage: round(seconds, 4) for stage, seconds in record.stage_durations.items()},
+        total_frames=record.total_frames,
+        sampled_frames=record.sampled_frames
+    )
+
+def to_comparison_result(job: AnalysisJob) -> Optional[MultiTemplateAnalysisResult]:
+    """Rank a multi-template job's stored sessions; None once none of them is left"""
+    records = {tid: storage_backend.get_session(session_id) for tid, session_id in job.session_ids.items()}
+    records = {tid: record for tid, record in records.items() if record is not None}
+    if not records:
+        return None
+    stored = {tid: template_store.get(tid) for tid in records}
+    ranking = sorted(
+        (TemplateMatch(template_id=tid, name=stored[tid].name if stored[tid] is not None else tid,
+                       overall_similarity=record.overall_similarity, session_id=record.session_id)
+         for tid, record in records.items()),
+        key=lambda match: match.overall_similarity,
+        reverse=True
+    )
+    return MultiTemplateAnalysisResult(
+        job_id=job.job_id,
+        best_template_id=ranking[0].template_id,
+        ranking=ranking,
+        results={tid: to_analysis_result(record) for tid, record in records.items()}
+    )
 
 @app.get("/")
 async def root():
     return {"message": "Exercise Analysis API is running!", "version": "1.0.0"}
 
 @app.post("/templates/create")
-async def create_template(template: ExerciseTemplate):
+async def create_template(template: ExerciseTemplate, response: Response, profile: bool = False,
+                          x_admin_token: Optional[str] = Header(None)):
     """Create a new exercise template"""
+    return call_profiled("POST /templates/create", profile, x_admin_token, response, save_template, template)
+
+def save_template(template: ExerciseTemplate) -> dict:
+    if len(template.landmarks) != NUM_LANDMARKS:
+        raise HTTPException(status_code=422, detail=f"Templates need exactly {NUM_LANDMARKS} landmarks")
+    if template.keyframes is not None:
+        if not template.keyframes or len(template.keyframes) > settings.max_template_keyframes:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Templates take between 1 and {settings.max_template_keyframes} keyframes"
+            )
+        if any(len(keyframe) != NUM_LANDMARKS for keyframe in template.keyframes):
+            raise HTTPException(status_code=422, detail=f"Every keyframe needs exactly {NUM_LANDMARKS} landmarks")
+    
     try:
         template_id = str(uuid.uuid4())
         template.created_at = datetime.now()
-        exercise_templates[template_id] = template
         
-        # Save to file
-        os.makedirs("templates", exist_ok=True)
-        with open(f"templates/{template_id}.json", "w") as f:
-            json.dump(template.dict(), f, indent=2, default=str)
+        # Persist to the template store
+        template_store.add(
+            template_id, template.name, template.description,
+            template.created_at.isoformat(), landmarks_to_array(template.landmarks),
+            None if template.keyframes is None
+            else np.stack([landmarks_to_array(keyframe) for keyframe in template.keyframes])
+        )
         
         return {
             "message": "Template created successfully",
@@ -251,188 +655,556 @@ async def create_template(template: ExerciseTemplate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating template: {str(e)}")
 
+def encode_cursor(position) -> str:
+    """Opaque pagination cursor for a position in a listing"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, expected_type: type):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        position = None
+    if (not isinstance(position, expected_type) or isinstance(position, bool)
+            or (isinstance(position, int) and position < 0)):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    return position
+
+def listing_etag(*parts) -> str:
+    return '"' + hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this representation"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+TEMPLATE_LISTING_FIELDS = ("landmarks",)
+
+def template_summary(stored: StoredTemplate, include_landmarks: bool) -> dict:
+    """Listing projection of a template; landmarks only when asked for"""
+    summary = {
+        "id": stored.template_id,
+        "name": stored.name,
+        "description": stored.description,
+        "created_at": stored.created_at,
+        "keyframe_count": 0 if stored.keyframes is None else len(stored.keyframes)
+    }
+    if include_landmarks:
+        summary["landmarks"] = stored.landmark_dicts()
+    return summary
+
 @app.get("/templates")
-async def list_templates():
-    """List all exercise templates"""
-    return {"templates": exercise_templates}
+async def list_templates(request: Request, response: Response, limit: int = Query(50, ge=1, le=500),
+                         cursor: Optional[str] = None, fields: Optional[str] = None, profile: bool = False,
+                         x_admin_token: Optional[str] = Header(None)):
+    """List exercise templates a page at a time.
+    
+    Items carry id, name, description and created_at; ``fields=landmarks`` adds
+    the landmarks. Pass ``next_cursor`` back as ``cursor`` for the next page.
+    Responses carry an ETag, and a matching If-None-Match returns 304.
+    """
+    return call_profiled("GET /templates", profile, x_admin_token, response,
+                         template_listing, request, limit, cursor, fields)
+
+def template_listing(request: Request, limit: int, cursor: Optional[str], fields: Optional[str]) -> Response:
+    requested_fields = {field.strip() for field in (fields or "").split(",") if field.strip()}
+    unknown = requested_fields.difference(TEMPLATE_LISTING_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    offset = decode_cursor(cursor, int) if cursor else 0
+    
+    template_store.refresh()
+    total = len(template_store)
+    # Templates are append-only, so their count identifies the catalog version
+    etag = listing_etag("templates", total, offset, limit, ",".join(sorted(requested_fields)))
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    page = template_store.page(offset, limit)
+    next_offset = offset + len(page)
+    return JSONResponse(
+        {
+            "templates": [template_summary(stored, "landmarks" in requested_fields) for stored in page],
+            "next_cursor": encode_cursor(next_offset) if next_offset < total else None
+        },
+        headers={"ETag": etag}
+    )
 
 @app.get("/templates/{template_id}")
-async def get_template(template_id: str):
+async def get_template(template_id: str, response: Response, profile: bool = False,
+                       x_admin_token: Optional[str] = Header(None)):
     """Get a specific exercise template"""
-    if template_id not in exercise_templates:
+    return call_profiled("GET /templates/{template_id}", profile, x_admin_token, response,
+                         load_template, template_id)
+
+def load_template(template_id: str) -> ExerciseTemplate:
+    stored = template_store.get(template_id)
+    if stored is None:
         raise HTTPException(status_code=404, detail="Template not found")
-    return exercise_templates[template_id]
+    return to_exercise_template(stored)
 
-@app.post("/analyze/webcam/{template_id}")
-async def start_webcam_analysis(template_id: str, duration_seconds: int = 30):
-    """Start webcam analysis session"""
-    if template_id not in exercise_templates:
+@app.post("/analyze/webcam/{template_id}", deprecated=True)
+async def start_webcam_analysis(template_id: str, duration_seconds: int = 30,
+                                target_fps: Optional[float] = Query(None, gt=0),
+                                max_long_edge: Optional[int] = Query(None, ge=0),
+                                difficulty: Optional[str] = None):
+    """Start webcam analysis session on the server's own camera.
+    
+    Deprecated: only works when the API runs next to a camera. Clients should
+    stream frames to /ws/live-frames/{template_id} (or landmarks to /ws/live/{template_id}).
+    """
+    stored = template_store.get(template_id)
+    if stored is None:
         raise HTTPException(status_code=404, detail="Template not found")
+    difficulty_level(difficulty)
     
     session_id = str(uuid.uuid4())
     
     try:
-        template = exercise_templates[template_id]
-        template_landmarks = [LandmarkData(**landmark.dict()) for landmark in template.landmarks]
+        template = stored.compiled
         
         cap = cv2.VideoCapture(0)
         if not cap.isOpened():
             raise HTTPException(status_code=500, detail="Could not access webcam")
         
-        similarities = []
-        all_joint_errors = {'critical': [], 'moderate': [], 'minor': []}
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or settings.default_capture_fps
+        stride = frame_stride(source_fps, target_fps or settings.analysis_target_fps)
+        track = LandmarkTrackBuilder(capacity=duration_seconds * 30 // stride + 1)
+        frame_indices = []
+        preprocessor = FramePreprocessor(inference_long_edge(max_long_edge))
         frame_count = 0
+        sampled_frames = 0
         start_time = datetime.now()
         
-        while cap.isOpened() and frame_count < duration_seconds * 30:  # Assuming 30 FPS
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = analyzer.pose.process(rgb_frame)
-            
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-                
-                # Convert to LandmarkData objects
-                student_landmarks = [
-                    LandmarkData(x=lm.x, y=lm.y, z=lm.z, visibility=lm.visibility)
-                    for lm in landmarks
-                ]
-                
-                # Calculate similarity
-                similarity = analyzer.weighted_similarity(student_landmarks, template_landmarks)
-                similarities.append(similarity)
-                
-                # Analyze joint errors
-                joint_errors = analyzer.analyze_joint_angles(student_landmarks, template_landmarks)
-                
-                # Accumulate errors
-                for error_type in all_joint_errors:
-                    all_joint_errors[error_type].extend(joint_errors[error_type])
-            
-            frame_count += 1
-        
-        cap.release()
-        
-        # Calculate results
-        overall_similarity = np.mean(similarities) if similarities else 0.0
-        analysis_duration = (datetime.now() - start_time).total_seconds()
-        
-        # Generate recommendations
-        recommendations = analyzer.generate_recommendations(overall_similarity, all_joint_errors)
+        try:
+            with pose_pool.checkout(settings.model_complexity, settings.min_detection_confidence,
+                                    settings.min_tracking_confidence,
+                                    timeout=settings.pose_checkout_timeout) as pose:
+                while cap.isOpened() and frame_count < duration_seconds * 30:  # Assuming 30 FPS
+                    if frame_count % stride:
+                        if not cap.grab():
+                            break
+                        frame_count += 1
+                        continue
+                    
+                    frame = preprocessor.read(cap)
+                    if frame is None:
+                        break
+                    
+                    results = pose.process(preprocessor.to_rgb(frame))
+                    
+                    if results.pose_landmarks:
+                        track.append(results.pose_landmarks.landmark)
+                        frame_indices.append(frame_count)
+                    
+                    frame_count += 1
+                    sampled_frames += 1
+        except PoolExhaustedError:
+            raise HTTPException(status_code=503, detail="All pose estimators are busy, try again later")
+        finally:
+            cap.release()
         
-        # Create analysis result
-        result = AnalysisResult(
-            session_id=session_id,
-            overall_similarity=overall_similarity,
-            frame_similarities=similarities,
-            joint_errors=all_joint_errors,
-            recommendations=recommendations,
-            analysis_duration=analysis_duration,
-            total_frames=frame_count
+        record_frame_counts("webcam", sampled_frames, len(track))
+        record = build_analysis_record(
+            session_id, track.array(), template, frame_count, sampled_frames, start_time, difficulty,
+            source_fps / stride, frame_times=np.array(frame_indices, dtype=np.float64) / source_fps
         )
+        storage_backend.put_sessions([record])
         
-        analysis_sessions[session_id] = result
-        
-        return result
+        return to_analysis_result(record)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@app.post("/analyze/video/{template_id}")
-async def analyze_video(template_id: str, video: UploadFile = File(...)):
-    """Analyze uploaded video file"""
-    if template_id not in exercise_templates:
+async def queue_video_analysis(video: UploadFile, job: AnalysisJob, target_fps: Optional[float],
+                               max_long_edge: Optional[int], on_track,
+                               profile_endpoint: Optional[str] = None) -> dict:
+    """Spool an upload to disk and queue pose extraction for it.
+
+    ``on_track(track, stage_durations)`` scores the result; ``stage_durations`` has
+    the upload and queue wait times followed by the worker's extraction stages.
+    With ``profile_endpoint`` set, extraction (in the worker) and scoring are each
+    profiled and the report is saved under the job id when the job ends.
+    """
+    video_path = temp_video_path(job.job_id, video.filename)
+    profile_sections = {}
+    
+    def on_extracted(output):
+        if profile_endpoint:
+            track, profile_sections["extraction"] = output
+        else:
+            track = output
+        stage_durations = {
+            "upload": upload_seconds,
+            "queue": (job.started_at - queued_at).total_seconds(),
+            **(track.stage_durations or {})
+        }
+        record_stage_durations(stage_durations)
+        record_frame_counts("video", track.sampled_frames, len(track.landmarks))
+        pose_track_cache_lookups.inc(result="hit" if track.cached else "miss")
+        if profile_endpoint:
+            profiler = Profiler(settings.profile_top_entries)
+            try:
+                with profiler:
+                    on_track(track, stage_durations)
+            finally:
+                profile_sections["scoring"] = profiler.report()
+        else:
+            on_track(track, stage_durations)
+    
+    def finish():
+        jobs_finished.inc(status=job.status)
+        remove_temp_file(video_path)
+        if profile_endpoint:
+            save_profile(job.job_id, profile_endpoint, profile_sections, job.error)
+    
+    try:
+        upload_started = time.perf_counter()
+        content_digest = await save_upload(video, video_path)
+        upload_seconds = time.perf_counter() - upload_started
+        queued_at = datetime.now()
+        work = pose_track_loader(str(video_path), content_digest, target_fps, max_long_edge)
+        if profile_endpoint:
+            work = functools.partial(run_profiled, work, settings.profile_top_entries)
+        job_queue.submit(
+            job,
+            work,
+            (),
+            on_extracted,
+            on_finished=finish
+        )
+    except HTTPException:
+        remove_temp_file(video_path)
+        raise
+    except Exception as e:
+        remove_temp_file(video_path)
+        raise HTTPException(status_code=500, detail=f"Video analysis failed: {str(e)}")
+    
+    accepted = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.job_id}",
+        "result_url": f"/jobs/{job.job_id}/result"
+    }
+    if profile_endpoint:
+        accepted["profile_url"] = f"/profiles/{job.job_id}"
+    return accepted
+
+@app.post("/analyze/video", status_code=202)
+async def analyze_video_multi(video: UploadFile = File(...), template_ids: List[str] = Form(...),
+                              target_fps: Optional[float] = Query(None, gt=0),
+                              max_long_edge: Optional[int] = Query(None, ge=0),
+                              difficulty: Optional[str] = None, profile: bool = False,
+                              x_admin_token: Optional[str] = Header(None)):
+    """Queue one video for analysis against several templates in a single pass"""
+    if profile:
+        require_admin(x_admin_token)
+    # Accept repeated form fields as well as comma-separated ids
+    requested = [tid.strip() for value in template_ids for tid in value.split(",") if tid.strip()]
+    requested = list(dict.fromkeys(requested))
+    if not requested:
+        raise HTTPException(status_code=422, detail="At least one template id is required")
+    
+    templates = {tid: template_store.get(tid) for tid in requested}
+    missing = [tid for tid, stored in templates.items() if stored is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Templates not found: {', '.join(missing)}")
+    difficulty_level(difficulty)
+    
+    compiled_templates = {tid: stored.compiled for tid, stored in templates.items()}
+    job = AnalysisJob(job_id=str(uuid.uuid4()), template_ids=requested, created_at=datetime.now())
+    
+    def store_results(track: PoseTrack, stage_durations: Dict[str, float]):
+        # Pose extraction ran once; score the same track against every template
+        records = {}
+        for tid, template in compiled_templates.items():
+            session_id = str(uuid.uuid4())
+            record = build_analysis_record(
+                session_id, track.landmarks, template,
+                track.total_frames, track.sampled_frames, job.started_at, difficulty, track.fps,
+                stage_durations, track.frame_times
+            )
+            records[tid] = record
+        storage_backend.put_sessions(list(records.values()))
+        # The job only points at the sessions; the ranking is rebuilt from them on request
+        job.session_ids = {tid: record.session_id for tid, record in records.items()}
+    
+    return await queue_video_analysis(video, job, target_fps, max_long_edge, store_results,
+                                      "POST /analyze/video" if profile else None)
+
+@app.post("/analyze/video/{template_id}", status_code=202)
+async def analyze_video(template_id: str, video: UploadFile = File(...),
+                        target_fps: Optional[float] = Query(None, gt=0),
+                        max_long_edge: Optional[int] = Query(None, ge=0),
+                        difficulty: Optional[str] = None, profile: bool = False,
+                        x_admin_token: Optional[str] = Header(None)):
+    """Queue an uploaded video file for analysis and return its job id.
+    
+    Admins can pass ``profile=true`` to record a CPU and memory profile of the job.
+    """
+    if profile:
+        require_admin(x_admin_token)
+    stored = template_store.get(template_id)
+    if stored is None:
         raise HTTPException(status_code=404, detail="Template not found")
+    difficulty_level(difficulty)
     
     session_id = str(uuid.uuid4())
+    template = stored.compiled
+    job = AnalysisJob(job_id=session_id, template_id=template_id, created_at=datetime.now())
+    
+    def store_result(track: PoseTrack, stage_durations: Dict[str, float]):
+        storage_backend.put_sessions([build_analysis_record(
+            session_id, track.landmarks, template,
+            track.total_frames, track.sampled_frames, job.started_at, difficulty, track.fps,
+            stage_durations, track.frame_times
+        )])
+        job.session_ids = {template_id: session_id}
+    
+    return await queue_video_analysis(video, job, target_fps, max_long_edge, store_result,
+                                      "POST /analyze/video/{template_id}" if profile else None)
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status of a video analysis job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Get the analysis result of a finished job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == JOB_FAILED:
+        # Unreadable uploads are the caller's fault; anything else is ours
+        raise HTTPException(status_code=422 if job.client_error else 500,
+                            detail=f"Video analysis failed: {job.error}")
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}")
+    if job.template_ids:
+        comparison = to_comparison_result(job)
+        if comparison is None:
+            raise HTTPException(status_code=404, detail="Analysis sessions not found")
+        return comparison
+    record = storage_backend.get_session(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Analysis session not found")
+    return to_analysis_result(record)
+
+def new_live_session(template: CompiledTemplate, difficulty: Optional[str],
+                     fps: Optional[float] = None) -> LiveScoringSession:
+    level = DIFFICULTY_LEVELS.get(difficulty) if difficulty else None
+    return LiveScoringSession(
+        analyzer.engine, template, settings.similarity_buffer_size,
+        level["angle_tolerance_multiplier"] if level else 1.0,
+        reps=analyzer.new_rep_detector(template),
+        fps=fps or settings.default_capture_fps
+    )
+
+def live_session_summary(session: LiveScoringSession, difficulty: Optional[str]) -> dict:
+    """End-of-stream summary with recommendations drawn from the session's aggregates"""
+    level = DIFFICULTY_LEVELS.get(difficulty) if difficulty else None
+    return {
+        **session.summary(),
+        "recommendations": analyzer.generate_recommendations(
+            session.overall_similarity, session.errors, level
+        )
+    }
+
+@app.websocket("/ws/live/{template_id}")
+async def live_scoring(websocket: WebSocket, template_id: str, difficulty: Optional[str] = None,
+                       fps: Optional[float] = None):
+    """Score landmarks streamed from a client-side pose estimator.
+    
+    Each binary message carries one or more frames of 33 x (x, y, z, visibility)
+    little-endian float32 values. The server answers every frame with a JSON
+    feedback message; sending the text message "end" returns a session summary.
+    ``fps`` is the client's frame rate, used to time reps.
+    """
+    stored = template_store.get(template_id)
+    if stored is None:
+        await websocket.close(code=4404, reason="Template not found")
+        return
+    if difficulty is not None and difficulty not in DIFFICULTY_LEVELS:
+        await websocket.close(code=4422, reason="Unknown difficulty")
+        return
+    if fps is not None and fps <= 0:
+        await websocket.close(code=4422, reason="fps must be positive")
+        return
+    
+    await websocket.accept()
+    session = new_live_session(stored.compiled, difficulty, fps)
     
     try:
-        # Save uploaded video
-        video_path = f"temp_{session_id}.mp4"
-        with open(video_path, "wb") as f:
-            content = await video.read()
-            f.write(content)
-        
-        template = exercise_templates[template_id]
-        template_landmarks = [LandmarkData(**landmark.dict()) for landmark in template.landmarks]
-        
-        cap = cv2.VideoCapture(video_path)
-        similarities = []
-        all_joint_errors = {'critical': [], 'moderate': [], 'minor': []}
-        frame_count = 0
-        start_time = datetime.now()
-        
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
                 break
             
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = analyzer.pose.process(rgb_frame)
+            if message.get("bytes") is not None:
+                try:
+                    track = decode_landmark_frames(message["bytes"], settings.live_max_frames_per_message)
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                frames_processed.inc(len(track), source="live")
+                for feedback in session.score(track):
+                    await websocket.send_json({"type": "frame", **feedback})
+            elif (message.get("text") or "").strip() == "end":
+                await websocket.send_json(live_session_summary(session, difficulty))
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+
+@app.websocket("/ws/live-frames/{template_id}")
+async def live_frame_scoring(websocket: WebSocket, template_id: str, difficulty: Optional[str] = None,
+                             fps: Optional[float] = None):
+    """Score camera frames streamed by a thin client that cannot run pose estimation.
+    
+    Each binary message is one JPEG (or PNG) encoded frame. The server decodes it,
+    runs pose inference on a pooled Pose instance and answers with a JSON feedback
+    message. When inference falls behind, only the newest frame is kept and older
+    ones are dropped; every reply reports the dropped-frame count. Sending the text
+    message "end" returns a session summary.
+    """
+    stored = template_store.get(template_id)
+    if stored is None:
+        await websocket.close(code=4404, reason="Template not found")
+        return
+    if difficulty is not None and difficulty not in DIFFICULTY_LEVELS:
+        await websocket.close(code=4422, reason="Unknown difficulty")
+        return
+    if fps is not None and fps <= 0:
+        await websocket.close(code=4422, reason="fps must be positive")
+        return
+    
+    loop = asyncio.get_running_loop()
+    checkout = pose_pool.checkout(
+        settings.model_complexity, settings.min_detection_confidence,
+        settings.min_tracking_confidence, timeout=settings.pose_checkout_timeout
+    )
+    try:
+        # Wait for a free Pose on the default executor so inference threads stay available
+        pose = await loop.run_in_executor(None, checkout.__enter__)
+    except PoolExhaustedError:
+        await websocket.close(code=1013, reason="All pose estimators are busy, try again later")
+        return
+    
+    try:
+        await websocket.accept()
+    except BaseException:
+        # The handshake failed; the finally below that returns the Pose is never reached
+        checkout.__exit__(None, None, None)
+        raise
+    session = new_live_session(stored.compiled, difficulty, fps)
+    preprocessor = FramePreprocessor(settings.inference_max_long_edge)
+    slot = LatestFrameSlot()
+    missed_pose_frames = 0
+    
+    async def run_inference():
+        nonlocal missed_pose_frames
+        while True:
+            item = await slot.get()
+            if item is None:
+                return
+            frame_index, payload = item
+            try:
+                landmarks = await loop.run_in_executor(
+                    live_inference_executor, infer_encoded_frame, pose, preprocessor, payload
+                )
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "frame": frame_index, "detail": str(e)})
+                continue
             
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-                
-                student_landmarks = [
-                    LandmarkData(x=lm.x, y=lm.y, z=lm.z, visibility=lm.visibility)
-                    for lm in landmarks
-                ]
-                
-                similarity = analyzer.weighted_similarity(student_landmarks, template_landmarks)
-                similarities.append(similarity)
-                
-                joint_errors = analyzer.analyze_joint_angles(student_landmarks, template_landmarks)
-                
-                for error_type in all_joint_errors:
-                    all_joint_errors[error_type].extend(joint_errors[error_type])
+            frames_processed.inc(source="live_frames")
+            if landmarks is None:
+                missed_pose_frames += 1
+                frames_without_pose.inc(source="live_frames")
+                await websocket.send_json({
+                    "type": "frame", "frame": frame_index, "pose_detected": False,
+                    "dropped_frames": slot.dropped
+                })
+                continue
             
-            frame_count += 1
-        
-        cap.release()
-        os.remove(video_path)  # Clean up
-        
-        overall_similarity = np.mean(similarities) if similarities else 0.0
-        analysis_duration = (datetime.now() - start_time).total_seconds()
-        recommendations = analyzer.generate_recommendations(overall_similarity, all_joint_errors)
-        
-        result = AnalysisResult(
-            session_id=session_id,
-            overall_similarity=overall_similarity,
-            frame_similarities=similarities,
-            joint_errors=all_joint_errors,
-            recommendations=recommendations,
-            analysis_duration=analysis_duration,
-            total_frames=frame_count
-        )
-        
-        analysis_sessions[session_id] = result
-        return result
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Video analysis failed: {str(e)}")
+            # Dropped frames still count towards the time, so reps keep their tempo
+            feedback = session.score(landmarks[None], np.array([frame_index / session.fps]))[0]
+            feedback["frame"] = frame_index
+            await websocket.send_json({
+                "type": "frame", **feedback, "pose_detected": True,
+                "dropped_frames": slot.dropped
+            })
+    
+    inference_task = asyncio.create_task(run_inference())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            if message.get("bytes") is not None:
+                dropped = slot.dropped
+                slot.put((slot.received, message["bytes"]))
+                if slot.dropped > dropped:
+                    live_frames_dropped.inc()
+            elif (message.get("text") or "").strip() == "end":
+                slot.close()
+                await inference_task
+                await websocket.send_json({
+                    **live_session_summary(session, difficulty),
+                    "received_frames": slot.received,
+                    "dropped_frames": slot.dropped,
+                    "frames_without_pose": missed_pose_frames
+                })
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        slot.close()
+        if not inference_task.done():
+            inference_task.cancel()
+        try:
+            await inference_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        checkout.__exit__(None, None, None)
 
 @app.get("/analysis/{session_id}")
 async def get_analysis_result(session_id: str):
     """Get analysis result by session ID"""
-    if session_id not in analysis_sessions:
+    record = storage_backend.get_session(session_id)
+    if record is None:
         raise HTTPException(status_code=404, detail="Analysis session not found")
-    return analysis_sessions[session_id]
+    return to_analysis_result(record)
 
 @app.get("/analysis")
-async def list_analysis_sessions():
-    """List all analysis sessions"""
-    return {"sessions": list(analysis_sessions.keys())}
+async def list_analysis_sessions(request: Request, limit: int = Query(100, ge=1, le=1000),
+                                 cursor: Optional[str] = None):
+    """List analysis session ids a page at a time, with the same cursor and ETag handling as /templates"""
+    after = decode_cursor(cursor, str) if cursor else None
+    ids = storage_backend.session_page(after, limit + 1)
+    page = ids[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(ids) > limit else None
+    
+    etag = listing_etag("sessions", next_cursor, *page)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse({"sessions": page, "next_cursor": next_cursor}, headers={"ETag": etag})
 
 @app.delete("/analysis/{session_id}")
 async def delete_analysis_session(session_id: str):
     """Delete an analysis session"""
-    if session_id not in analysis_sessions:
+    if not storage_backend.delete_session(session_id):
         raise HTTPException(status_code=404, detail="Analysis session not found")
     
-    del analysis_sessions[session_id]
     return {"message": "Analysis session deleted successfully"}
 
 @app.get("/health")
@@ -441,10 +1213,33 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now(),
-        "templates_count": len(exercise_templates),
-        "active_sessions": len(analysis_sessions)
+        "templates_count": len(template_store),
+        "active_sessions": storage_backend.session_count(),
+        "session_storage": storage_backend.stats(),
+        "queued_jobs": job_queue.queue_depth,
+        "pose_pool": pose_pool.stats()
     }
 
+@app.get("/profiles")
+async def list_profiles(limit: int = Query(50, ge=1, le=500), x_admin_token: Optional[str] = Header(None)):
+    """Saved profile reports, newest first (admin only)"""
+    require_admin(x_admin_token)
+    return {"profiles": profile_store.list(limit)}
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """A saved profile report: cProfile output, peak memory and top allocation sites per section (admin only)"""
+    require_admin(x_admin_token)
+    report = profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, gauges and per-stage latency histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics_registry.render(), media_type=MetricsRegistry.content_type)
+
 if __name__ == "__main__":
     import uvicorn
     # Use settings for host/port and reload behavior
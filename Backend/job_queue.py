@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+class JobInputError(ValueError):
+    """Raised by job work when its input is unusable, e.g. an upload that is not a readable video.
+
+    The job fails with ``client_error`` set, so the API can blame the request instead of the server.
+    """
+
+class AnalysisJob(BaseModel):
+    job_id: str
+    template_id: Optional[str] = None
+    template_ids: List[str] = []
+    status: str = JOB_QUEUED
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    client_error: bool = False  # failed on its input (JobInputError), not on an internal error
+    session_ids: Dict[str, str] = {}  # template id -> session holding its result
+
+class AnalysisJobQueue:
+    """Runs CPU-heavy analysis work on a process pool, off the event loop.
+
+    At most ``max_workers`` jobs run at once; the rest wait in ``queued`` state.
+    Success callbacks (scoring, storage writes) run on a thread pool of the same
+    size, so they never block the event loop either.
+
+    ``persist(job)`` is called on submit and after every status change, and
+    ``lookup(job_id)`` is asked for jobs this process does not know, so with a
+    shared store any API worker can report on a job accepted by another one.
+    Finished jobs are then only kept there, not in ``jobs``.
+    """
+
+    def __init__(self, max_workers: int,
+                 persist: Optional[Callable[[AnalysisJob], None]] = None,
+                 lookup: Optional[Callable[[str], Optional[AnalysisJob]]] = None):
+        self.max_workers = max(1, max_workers)
+        self.persist = persist
+        self.lookup = lookup
+        self.jobs: Dict[str, AnalysisJob] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._callback_executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        """Create the worker pool (call from the app lifespan)"""
+        if self._executor is None:
+            # spawn keeps MediaPipe's native threads out of the forked children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._callback_executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="job-callback"
+            )
+
+    def shutdown(self):
+        """Stop the worker pool, cancelling jobs that have not started"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._callback_executor is not None:
+            self._callback_executor.shutdown(wait=False, cancel_futures=True)
+            self._callback_executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JOB_QUEUED)
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JOB_RUNNING)
+
+    def submit(self, job: AnalysisJob, work: Callable[..., Any], args: tuple,
+               on_success: Callable[[Any], None],
+               on_finished: Optional[Callable[[], None]] = None) -> AnalysisJob:
+        """Queue ``work(*args)`` for a pool worker and call ``on_success`` with its return value.
+
+        ``on_success`` runs on a worker thread, not on the event loop.
+
+        ``on_finished`` always runs once the job ends, whether it succeeded, failed or was cancelled.
+        """
+        self.start()
+        self.jobs[job.job_id] = job
+        # Written before the job id is returned, so another worker can already answer for it
+        self._persist(job)
+        task = asyncio.create_task(self._run(job, work, args, on_success, on_finished))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        job = self.jobs.get(job_id)
+        if job is None and self.lookup is not None:
+            job = self.lookup(job_id)
+        return job
+
+    def _persist(self, job: AnalysisJob) -> bool:
+        if self.persist is None:
+            return False
+        try:
+            self.persist(job)
+        except Exception as e:
+            logger.error(f"Could not persist analysis job {job.job_id}: {e}")
+            return False
+        return True
+
+    async def _run(self, job: AnalysisJob, work: Callable[..., Any], args: tuple,
+                   on_success: Callable[[Any], None],
+                   on_finished: Optional[Callable[[], None]]):
+        try:
+            async with self._semaphore:
+                job.status = JOB_RUNNING
+                job.started_at = datetime.now()
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._callback_executor, self._persist, job)
+                try:
+                    output = await loop.run_in_executor(self._executor, work, *args)
+                    await loop.run_in_executor(self._callback_executor, on_success, output)
+                    job.status = JOB_COMPLETED
+                except Exception as e:
+                    job.status = JOB_FAILED
+                    job.error = str(e)
+                    job.client_error = isinstance(e, JobInputError)
+                    if job.client_error:
+                        logger.warning(f"Analysis job {job.job_id} rejected its input: {e}")
+                    else:
+                        logger.error(f"Analysis job {job.job_id} failed: {e}")
+                finally:
+                    job.finished_at = datetime.now()
+                if await loop.run_in_executor(self._callback_executor, self._persist, job):
+                    self.jobs.pop(job.job_id, None)
+        finally:
+            if on_finished is not None:
+                on_finished()
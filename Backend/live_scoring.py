@@ -0,0 +1,148 @@
+import asyncio
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rep_detection import RepDetector
+from scoring_engine import (
+    LANDMARK_FIELDS, NUM_LANDMARKS, SEVERITY_LEVELS, CompiledTemplate, JointErrorAggregator,
+    PoseScoringEngine
+)
+
+# One frame on the wire: 33 landmarks x (x, y, z, visibility) as little-endian float32
+FRAME_BYTES = NUM_LANDMARKS * LANDMARK_FIELDS * 4
+
+def decode_landmark_frames(payload: bytes, max_frames: int) -> np.ndarray:
+    """Decode a binary message of one or more packed frames into a (frames, 33, 4) array"""
+    if not payload or len(payload) % FRAME_BYTES:
+        raise ValueError(f"Message length must be a non-zero multiple of {FRAME_BYTES} bytes")
+    frames = len(payload) // FRAME_BYTES
+    if frames > max_frames:
+        raise ValueError(f"At most {max_frames} frames per message")
+    return np.frombuffer(payload, dtype="<f4").reshape(frames, NUM_LANDMARKS, LANDMARK_FIELDS)
+
+class LiveScoringSession:
+    """Per-connection state for live scoring of streamed landmarks.
+
+    Memory per frame stays constant however long the session runs: a fixed-size
+    window of recent similarities for the rolling score, running totals for the
+    overall score, a JointErrorAggregator for per-joint error statistics and a
+    RepDetector that keeps one entry per completed rep. Frames are timed at
+    ``fps`` unless the caller passes their times.
+    """
+
+    def __init__(self, engine: PoseScoringEngine, template: CompiledTemplate, window_size: int,
+                 tolerance_multiplier: float = 1.0, reps: Optional[RepDetector] = None,
+                 fps: float = 30.0):
+        self.engine = engine
+        self.template = template
+        self.reps = reps if reps is not None else RepDetector(engine.joint_names)
+        self.fps = fps
+        self.frames = 0
+        self.similarity_sum = 0.0
+        self.window = deque(maxlen=window_size)
+        self.window_sum = 0.0
+        self.errors = JointErrorAggregator(engine, template, tolerance_multiplier)
+
+    @property
+    def overall_similarity(self) -> float:
+        return self.similarity_sum / self.frames if self.frames else 0.0
+
+    def score(self, track: np.ndarray, times: Optional[np.ndarray] = None) -> List[Dict]:
+        """Score a batch of frames and return one feedback message per frame"""
+        similarities = self.engine.frame_similarities(track, self.template)
+        angles = self.engine.joint_angles(track)
+        deviations = np.abs(angles - self.template.joint_angles)
+        severities = self.errors.update(deviations)
+        rep_angles = np.where(self.engine.joints_visible(track), angles, np.nan)
+        if times is None:
+            times = (self.frames + np.arange(len(track))) / self.fps
+
+        feedback = []
+        for similarity, frame_angles, time, frame_deviations, frame_severities in zip(
+                similarities.tolist(), rep_angles.tolist(), np.asarray(times).tolist(),
+                deviations.tolist(), severities.tolist()):
+            if len(self.window) == self.window.maxlen:
+                self.window_sum -= self.window[0]
+            self.window.append(similarity)
+            self.window_sum += similarity
+            self.similarity_sum += similarity
+            completed = self.reps.push(frame_angles, similarity, time)
+
+            feedback.append({
+                "frame": self.frames,
+                "similarity": round(similarity, 2),
+                "rolling_similarity": round(self.window_sum / len(self.window), 2),
+                "joint_deviations": {
+                    name: round(deviation, 1)
+                    for name, deviation in zip(self.engine.joint_names, frame_deviations)
+                    if deviation == deviation  # skip NaN angles
+                },
+                "joint_errors": {
+                    name: SEVERITY_LEVELS[severity - 1]
+                    for name, severity in zip(self.engine.joint_names, frame_severities)
+                    if severity
+                },
+                "rep_count": len(self.reps.reps)
+            })
+            if completed is not None:
+                feedback[-1]["rep"] = completed.to_dict(len(self.reps.reps))
+            self.frames += 1
+        return feedback
+
+    def summary(self) -> Dict:
+        """Session totals sent when the client ends the stream"""
+        return {
+            "type": "summary",
+            "frames": self.frames,
+            "overall_similarity": round(self.overall_similarity, 2),
+            **self.reps.summary(),
+            "joint_errors": {
+                name: {
+                    **{level: int(count) for level, count in zip(SEVERITY_LEVELS, counts)},
+                    "worst_deviation": round(worst, 1),
+                    "time_in_error": round(fraction, 3)
+                }
+                for name, counts, worst, fraction in zip(
+                    self.errors.joint_names, self.errors.severity_counts.tolist(),
+                    self.errors.worst_deviation.tolist(), self.errors.time_in_error.tolist())
+                if any(counts)
+            }
+        }
+
+class LatestFrameSlot:
+    """Single-slot, latest-wins hand-off between a receiving and a processing task.
+
+    Putting a frame while the previous one is still waiting replaces it and counts
+    it as dropped, so a slow consumer never builds a backlog and latency stays
+    bounded to roughly one inference.
+    """
+
+    def __init__(self):
+        self._item: Optional[Any] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item: Any):
+        self.received += 1
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._ready.set()
+
+    async def get(self) -> Optional[Any]:
+        """Wait for the newest frame; returns None once closed and drained"""
+        while self._item is None:
+            if self._closed:
+                return None
+            await self._ready.wait()
+            self._ready.clear()
+        item, self._item = self._item, None
+        return item
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
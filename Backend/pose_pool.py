@@ -0,0 +1,99 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import mediapipe as mp
+
+logger = logging.getLogger(__name__)
+
+mp_pose = mp.solutions.pose
+
+PoseKey = Tuple[int, float, float]
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no Pose instance becomes free within the checkout timeout"""
+
+class PosePool:
+    """Bounded pool of MediaPipe Pose instances.
+
+    ``mp_pose.Pose`` keeps tracking state between ``process`` calls, so an instance
+    must only be used by one analysis at a time. Instances are keyed by their model
+    settings, at most ``max_per_key`` are created per key, and each one is reset
+    before it goes back into the pool so the next session starts with a clean tracker.
+    """
+
+    def __init__(self, max_per_key: int = 4):
+        self.max_per_key = max(1, max_per_key)
+        self._idle: Dict[PoseKey, List["mp_pose.Pose"]] = {}
+        self._created: Dict[PoseKey, int] = {}
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def checkout(self, model_complexity: int, min_detection_confidence: float,
+                 min_tracking_confidence: float, timeout: Optional[float] = None):
+        """Borrow a Pose instance for the duration of a ``with`` block"""
+        key = (model_complexity, min_detection_confidence, min_tracking_confidence)
+        pose = self._acquire(key, timeout)
+        try:
+            yield pose
+        finally:
+            self._release(key, pose)
+
+    def _acquire(self, key: PoseKey, timeout: Optional[float]):
+        with self._condition:
+            while True:
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    return idle.pop()
+                if self._created.get(key, 0) < self.max_per_key:
+                    self._created[key] = self._created.get(key, 0) + 1
+                    break
+                if not self._condition.wait(timeout):
+                    raise PoolExhaustedError("No pose estimator available")
+
+        # Build the graph outside the lock; it takes a while
+        try:
+            return mp_pose.Pose(
+                static_image_mode=False,
+                model_complexity=key[0],
+                min_detection_confidence=key[1],
+                min_tracking_confidence=key[2]
+            )
+        except Exception:
+            with self._condition:
+                self._created[key] -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, key: PoseKey, pose):
+        try:
+            pose.reset()
+        except Exception as e:
+            # A graph that cannot be reset is dropped instead of reused
+            logger.warning(f"Discarding pose estimator that failed to reset: {e}")
+            pose.close()
+            with self._condition:
+                self._created[key] -= 1
+                self._condition.notify()
+            return
+
+        with self._condition:
+            self._idle.setdefault(key, []).append(pose)
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "created": sum(self._created.values()),
+                "idle": sum(len(idle) for idle in self._idle.values())
+            }
+
+    def close(self):
+        """Close all idle Pose instances"""
+        with self._condition:
+            for key, idle in self._idle.items():
+                for pose in idle:
+                    pose.close()
+                self._created[key] -= len(idle)
+                idle.clear()
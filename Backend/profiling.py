@@ -0,0 +1,173 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Allocation sites inside the profilers themselves are left out of reports
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>")
+)
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9-]{1,64}$")
+
+# tracemalloc is process-wide, so only one Profiler may run at a time per process
+_profiling_lock = threading.Lock()
+
+class ProfilerBusyError(RuntimeError):
+    """Another Profiler is already running in this process"""
+
+class Profiler:
+    """cProfile and tracemalloc around one block of work.
+
+    Only used when a profile is requested: tracing is started on entry and
+    stopped on exit, so unprofiled requests run without any hooks installed.
+    Both slow the profiled code down noticeably; compare ``wall_seconds`` with
+    an unprofiled run rather than with ``stage_durations``.
+
+    Profiles in one process run one after another: with ``wait`` a second
+    Profiler blocks on entry until the first has exited, without it entry raises
+    ProfilerBusyError. Memory figures still include allocations made meanwhile
+    by unprofiled work on other threads.
+    """
+
+    def __init__(self, top_entries: int = 30, wait: bool = True):
+        self.top_entries = top_entries
+        self.wait = wait
+        self._profile = cProfile.Profile()
+        self._started_tracing = False
+        self._started_at = 0.0
+        self._report: Optional[Dict[str, Any]] = None
+
+    def __enter__(self) -> "Profiler":
+        if not _profiling_lock.acquire(blocking=self.wait):
+            raise ProfilerBusyError("Another profile is running in this process")
+        try:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            self._started_at = time.perf_counter()
+            self._profile.enable()
+        except BaseException:
+            _profiling_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self._profile.disable()
+            wall_seconds = time.perf_counter() - self._started_at
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            if self._started_tracing:
+                tracemalloc.stop()
+        finally:
+            _profiling_lock.release()
+
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(self.top_entries)
+        self._report = {
+            "wall_seconds": round(wall_seconds, 4),
+            "peak_memory_bytes": peak,
+            # Memory still held at the end of the block, grouped by the line that allocated it
+            "top_allocations": [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:self.top_entries]
+            ],
+            "cprofile": stream.getvalue()
+        }
+
+    def report(self) -> Dict[str, Any]:
+        if self._report is None:
+            raise RuntimeError("Profiler has not finished")
+        return self._report
+
+def run_profiled(work: Callable[[], Any], top_entries: int = 30) -> Tuple[Any, Dict[str, Any]]:
+    """Call ``work()`` under a Profiler; picklable, so it can wrap a process-pool job"""
+    profiler = Profiler(top_entries)
+    with profiler:
+        output = work()
+    return output, profiler.report()
+
+class ProfileStore:
+    """Profile reports kept as one JSON file each under a directory (``logs_dir/profiles``)"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def new_id() -> str:
+        return str(uuid.uuid4())
+
+    def _path(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return self.directory / f"{profile_id}.json"
+
+    def save(self, profile_id: str, endpoint: str, sections: Dict[str, Dict[str, Any]],
+             error: Optional[str] = None) -> Path:
+        path = self._path(profile_id)
+        if path is None:
+            raise ValueError(f"Invalid profile id: {profile_id}")
+        report = {
+            "profile_id": profile_id,
+            "endpoint": endpoint,
+            "created_at": datetime.now().isoformat(),
+            "error": error,
+            "sections": sections
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.directory / f".{profile_id}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return path
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(profile_id)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list(self, limit: int) -> List[Dict[str, Any]]:
+        """Newest reports first, without their section bodies"""
+        try:
+            paths = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        except FileNotFoundError:
+            return []
+        summaries = []
+        for path in paths[:limit]:
+            report = self.get(path.stem)
+            if report is not None:
+                summaries.append({
+                    "profile_id": report["profile_id"],
+                    "endpoint": report["endpoint"],
+                    "created_at": report["created_at"],
+                    "error": report.get("error"),
+                    "wall_seconds": {name: section.get("wall_seconds")
+                                     for name, section in report["sections"].items()}
+                })
+        return summaries
@@ -0,0 +1,198 @@
+import math
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+class Rep(NamedTuple):
+    """One completed repetition; times are in seconds from the start of the session"""
+    start_time: float
+    end_time: float
+    frames: int
+    similarity: float        # mean frame similarity over the rep
+    range_of_motion: float   # degrees the driving joint travelled between its extremes
+    flexion_time: float      # seconds spent closing the joint (angle decreasing)
+    extension_time: float    # seconds spent opening the joint (angle increasing)
+
+    def to_dict(self, index: int) -> Dict:
+        return {
+            "rep": index,
+            "start_time": round(self.start_time, 3),
+            "end_time": round(self.end_time, 3),
+            "duration": round(self.end_time - self.start_time, 3),
+            "frames": self.frames,
+            "similarity": round(self.similarity, 2),
+            "range_of_motion": round(self.range_of_motion, 1),
+            "flexion_time": round(self.flexion_time, 3),
+            "extension_time": round(self.extension_time, 3)
+        }
+
+class _Extreme(NamedTuple):
+    """A turning-point candidate together with the running totals at that frame"""
+    angle: float
+    time: float
+    frames: int
+    similarity_sum: float
+
+class RepDetector:
+    """Segments repetitions from joint-angle signals as frames arrive.
+
+    Every joint angle is smoothed with an exponential moving average. The first
+    joint to swing through ``min_range`` degrees (the one with the widest swing
+    at that moment, unless ``driving_joint`` fixes it) drives the segmentation.
+    Its turning points are found with hysteresis: an extreme is confirmed once
+    the angle has moved ``min_range`` degrees back from it. A rep runs from one
+    turning point to the next of the same kind, e.g. standing -> bottom -> standing.
+
+    State is a handful of scalars per joint plus running frame and similarity
+    totals, so cost and memory per frame are constant however long the set is.
+    Frame counts and similarity means of a rep are differences of those totals
+    taken at its turning points. Only completed reps are stored.
+    """
+
+    def __init__(self, joint_names: Sequence[str], min_range: float = 30.0,
+                 smoothing: float = 0.5, driving_joint: Optional[int] = None):
+        self.joint_names = list(joint_names)
+        self.min_range = min_range
+        self.smoothing = smoothing
+        self.driving_joint = driving_joint
+        self.reps: List[Rep] = []
+
+        joints = len(self.joint_names)
+        self.frames = 0
+        self.similarity_sum = 0.0
+        self._level: List[float] = [math.nan] * joints
+        self._high: List[Optional[_Extreme]] = [None] * joints
+        self._low: List[Optional[_Extreme]] = [None] * joints
+        self._joint: Optional[int] = None     # locked driving joint
+        self._falling = False                 # direction of the locked joint
+        self._extreme: Optional[_Extreme] = None
+        self._rep_start: Optional[_Extreme] = None
+        self._rep_turn: Optional[_Extreme] = None
+
+    @property
+    def joint(self) -> Optional[str]:
+        """Name of the joint driving segmentation, once one has been picked"""
+        return None if self._joint is None else self.joint_names[self._joint]
+
+    def update(self, angles: np.ndarray, similarities: np.ndarray, times: np.ndarray) -> List[Rep]:
+        """Feed a batch of (frames, joints) angles; returns the reps completed by it"""
+        completed = []
+        for frame_angles, similarity, time in zip(np.asarray(angles).tolist(),
+                                                  np.asarray(similarities).tolist(),
+                                                  np.asarray(times).tolist()):
+            rep = self.push(frame_angles, similarity, time)
+            if rep is not None:
+                completed.append(rep)
+        return completed
+
+    def push(self, angles: Sequence[float], similarity: float, time: float) -> Optional[Rep]:
+        """Feed one frame; returns the rep it completed, if any"""
+        self.frames += 1
+        self.similarity_sum += similarity
+
+        if self._joint is None:
+            self._track_all(angles, time)
+            return None
+
+        angle = self._smooth(self._joint, angles[self._joint])
+        if angle != angle:
+            return None  # no angle this frame; keep waiting
+        current = _Extreme(angle, time, self.frames, self.similarity_sum)
+
+        if self._falling:
+            if angle < self._extreme.angle:
+                self._extreme = current
+                return None
+            if angle < self._extreme.angle + self.min_range:
+                return None
+        else:
+            if angle > self._extreme.angle:
+                self._extreme = current
+                return None
+            if angle > self._extreme.angle - self.min_range:
+                return None
+
+        # The extreme is confirmed as a turning point; start tracking the opposite one
+        turn, self._extreme = self._extreme, current
+        self._falling = not self._falling
+        return self._turning_point(turn)
+
+    def _smooth(self, joint: int, angle: float) -> float:
+        level = self._level[joint]
+        if angle != angle:
+            return level
+        level = angle if level != level else level + self.smoothing * (angle - level)
+        self._level[joint] = level
+        return level
+
+    def _track_all(self, angles: Sequence[float], time: float):
+        """Before a driving joint is known, follow every joint's range since the start"""
+        candidates = range(len(angles)) if self.driving_joint is None else (self.driving_joint,)
+        widest, widest_range = None, self.min_range
+        for joint in candidates:
+            angle = self._smooth(joint, angles[joint])
+            if angle != angle:
+                continue
+            current = _Extreme(angle, time, self.frames, self.similarity_sum)
+            if self._high[joint] is None or angle > self._high[joint].angle:
+                self._high[joint] = current
+            if self._low[joint] is None or angle < self._low[joint].angle:
+                self._low[joint] = current
+            swing = self._high[joint].angle - self._low[joint].angle
+            if swing >= widest_range:
+                widest, widest_range = joint, swing
+
+        if widest is None:
+            return
+        # Lock on: whichever extreme came first is the starting position of the set
+        self._joint = widest
+        high, low = self._high[widest], self._low[widest]
+        self._falling = high.frames < low.frames
+        first, self._extreme = (high, low) if self._falling else (low, high)
+        self._high = self._low = None
+        self._turning_point(first)
+
+    def _turning_point(self, turn: _Extreme) -> Optional[Rep]:
+        if self._rep_start is None:
+            self._rep_start = turn
+            return None
+        if self._rep_turn is None:
+            self._rep_turn = turn
+            return None
+
+        start, middle = self._rep_start, self._rep_turn
+        first_phase, second_phase = middle.time - start.time, turn.time - middle.time
+        # A rep that starts at a high angle closes the joint first
+        flexion, extension = (first_phase, second_phase) if start.angle > middle.angle else (second_phase, first_phase)
+        frames = turn.frames - start.frames
+        rep = Rep(
+            start_time=start.time,
+            end_time=turn.time,
+            frames=frames,
+            similarity=(turn.similarity_sum - start.similarity_sum) / frames if frames else 0.0,
+            range_of_motion=max(abs(middle.angle - start.angle), abs(middle.angle - turn.angle)),
+            flexion_time=flexion,
+            extension_time=extension
+        )
+        self.reps.append(rep)
+        self._rep_start, self._rep_turn = turn, None
+        return rep
+
+    def summary(self) -> Dict:
+        """Rep count, per-rep results and averages over the completed reps"""
+        reps = self.reps
+        return {
+            "rep_count": len(reps),
+            "rep_joint": self.joint,
+            "reps": [rep.to_dict(i + 1) for i, rep in enumerate(reps)],
+            "average_rep_similarity": round(sum(rep.similarity for rep in reps) / len(reps), 2) if reps else None,
+            "average_rep_duration": round(sum(rep.end_time - rep.start_time for rep in reps) / len(reps), 3)
+            if reps else None
+        }
+
+def rep_array(reps: Sequence[Rep]) -> np.ndarray:
+    """Pack reps into a (reps, 7) float32 array for compact storage"""
+    return np.array([tuple(rep) for rep in reps], dtype=np.float32).reshape(-1, len(Rep._fields))
+
+def reps_from_array(array: np.ndarray) -> List[Rep]:
+    return [Rep(*row[:2], int(row[2]), *row[3:]) for row in np.asarray(array, dtype=np.float64).tolist()]
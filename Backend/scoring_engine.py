@@ -0,0 +1,380 @@
+import math
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Landmark tracks are stored as (frames, 33, 4) float32 arrays of x, y, z, visibility
+NUM_LANDMARKS = 33
+LANDMARK_FIELDS = 4
+VISIBILITY_THRESHOLD = 0.5
+
+SEVERITY_LEVELS = ('minor', 'moderate', 'critical')
+
+def build_landmark_weights(face: float = 0.3, upper_body: float = 1.5, lower_body: float = 2.0) -> np.ndarray:
+    """Build the per-landmark weight vector used for similarity scoring"""
+    weights = np.empty(NUM_LANDMARKS, dtype=np.float64)
+    weights[:11] = face          # Landmarks 0-10
+    weights[11:23] = upper_body  # Landmarks 11-22
+    weights[23:] = lower_body    # Landmarks 23-32
+    return weights
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+class CompiledSequence(NamedTuple):
+    """Precomputed scoring form of a (keyframes, 33, 4) keyframe sequence"""
+    landmarks: np.ndarray     # (keyframes, 33, 4) float64
+    weights: np.ndarray       # (keyframes, 33) landmark weights, zeroed where a keyframe is not visible
+    joint_angles: np.ndarray  # (keyframes, joints) reference angles in degrees
+
+class CompiledTemplate(NamedTuple):
+    """Precomputed, immutable scoring form of a (33, 4) template"""
+    landmarks: np.ndarray            # (33, 4) float64
+    visible: np.ndarray              # (33,) bool, template visibility >= threshold
+    weights: np.ndarray              # (33,) landmark weights, zeroed where the template is not visible
+    joint_angles: np.ndarray         # (joints,) reference angles in degrees
+    severity_thresholds: np.ndarray  # (joints, 3) deviation limits for minor, moderate, critical
+    sequence: Optional[CompiledSequence] = None  # keyframes of a movement template, scored with DTW
+
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """Convert a sequence of landmark objects (MediaPipe or LandmarkData) to a (33, 4) array"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks],
+        dtype=np.float32
+    )
+
+class LandmarkTrackBuilder:
+    """Growable (frames, 33, 4) float32 buffer that frames are appended to in place"""
+
+    def __init__(self, capacity: int = 256):
+        self._buffer = np.empty((max(1, capacity), NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, landmarks):
+        """Append one frame of MediaPipe landmarks"""
+        if self._size == len(self._buffer):
+            grown = np.empty((len(self._buffer) * 2, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+            grown[:self._size] = self._buffer[:self._size]
+            self._buffer = grown
+
+        row = self._buffer[self._size]
+        for i, lm in enumerate(landmarks):
+            row[i, 0] = lm.x
+            row[i, 1] = lm.y
+            row[i, 2] = lm.z
+            row[i, 3] = lm.visibility
+        self._size += 1
+
+    def array(self) -> np.ndarray:
+        """Return the filled part of the buffer as a (frames, 33, 4) array"""
+        return self._buffer[:self._size]
+
+class PoseScoringEngine:
+    """Scores whole landmark tracks against compiled templates with array operations"""
+
+    def __init__(self, joint_connections: Dict[str, Tuple[int, int, int]],
+                 angle_thresholds: Dict[str, Dict[str, float]],
+                 landmark_weights: np.ndarray = None):
+        self.joint_names = list(joint_connections.keys())
+        self.joint_indices = np.array(list(joint_connections.values()), dtype=np.intp)
+        self.landmark_weights = _read_only(
+            build_landmark_weights() if landmark_weights is None
+            else np.array(landmark_weights, dtype=np.float64)
+        )
+
+        # Per-joint tolerance, looked up the same way analyze_joint_angles does
+        tolerances = []
+        for joint_name in self.joint_names:
+            joint_type = joint_name.split('_')[1] if '_' in joint_name else 'shoulder'
+            threshold = angle_thresholds.get(joint_type, angle_thresholds['shoulder'])
+            tolerances.append(threshold['tolerance'])
+        self.joint_tolerances = np.array(tolerances, dtype=np.float64)
+        self.severity_thresholds = _read_only(self.joint_tolerances[:, None] * np.array([0.5, 1.0, 2.0]))
+
+    def compile_template(self, landmarks: np.ndarray) -> CompiledTemplate:
+        """Precompute everything scoring needs from a (33, 4) template"""
+        return self.compile_templates(np.asarray(landmarks)[None])[0]
+
+    def compile_templates(self, templates: np.ndarray) -> List[CompiledTemplate]:
+        """Compile a stack of (templates, 33, 4) templates in one pass"""
+        templates = np.array(templates, dtype=np.float64).reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS)
+        visible = templates[:, :, 3] >= VISIBILITY_THRESHOLD
+        weights = np.where(visible, self.landmark_weights, 0.0)
+        joint_angles = self.joint_angles(templates)
+
+        return [
+            CompiledTemplate(
+                landmarks=_read_only(templates[i]),
+                visible=_read_only(visible[i]),
+                weights=_read_only(weights[i]),
+                joint_angles=_read_only(joint_angles[i]),
+                severity_thresholds=self.severity_thresholds
+            )
+            for i in range(len(templates))
+        ]
+
+    def compile_sequence(self, keyframes: np.ndarray) -> CompiledSequence:
+        """Precompute everything DTW scoring needs from a (keyframes, 33, 4) sequence"""
+        keyframes = np.array(keyframes, dtype=np.float64).reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS)
+        weights = np.where(keyframes[:, :, 3] >= VISIBILITY_THRESHOLD, self.landmark_weights, 0.0)
+        return CompiledSequence(
+            landmarks=_read_only(keyframes),
+            weights=_read_only(weights),
+            joint_angles=_read_only(self.joint_angles(keyframes))
+        )
+
+    def with_sequence(self, template: CompiledTemplate, keyframes: Optional[np.ndarray]) -> CompiledTemplate:
+        """Attach a compiled keyframe sequence to a compiled template"""
+        if keyframes is None or not len(keyframes):
+            return template
+        return template._replace(sequence=self.compile_sequence(keyframes))
+
+    def _pair_similarities(self, track: np.ndarray, references: np.ndarray,
+                           reference_weights: np.ndarray) -> np.ndarray:
+        """Weighted similarity (0-100) of each frame to its own reference pose (both (frames, 33, ...))"""
+        distances = np.sqrt(np.sum((track[..., :3] - references[..., :3]) ** 2, axis=-1))
+        similarity = np.maximum(0.0, 1.0 - distances)
+        weights = np.where(track[..., 3] >= VISIBILITY_THRESHOLD, reference_weights, 0.0)
+
+        total_weight = weights.sum(axis=-1)
+        scores = np.zeros(total_weight.shape, dtype=np.float64)
+        np.divide((similarity * weights).sum(axis=-1) * 100, total_weight, out=scores, where=total_weight > 0)
+        return scores
+
+    def align_sequence(self, track: np.ndarray, sequence: CompiledSequence, max_step_ratio: float = 0.1,
+                       block_frames: int = 256, margin_frames: int = 64) -> np.ndarray:
+        """Align every frame of a track to a keyframe of a repeating movement with DTW.
+
+        The keyframes are one repetition of a cycle. Frames move forward through
+        them, by at most ``max_step_ratio`` of the keyframe count per frame (and at
+        least two keyframes), and wrap from the last keyframe back to the first, so
+        a clip with many reps is aligned rep by rep against a one-rep template. The
+        path may start and end at any keyframe (subsequence DTW), so a clip can
+        begin or stop mid-rep. The cost of a pair is their visibility-weighted mean
+        squared landmark distance.
+
+        The track is cut into blocks of ``block_frames`` frames. Each block is
+        aligned inside a window reaching ``margin_frames`` past it on both sides,
+        with an open start and end, and keeps the middle of its path: DTW paths
+        from different ends merge well within a couple of seconds. All windows run
+        the DP together, so the Python loop is as long as one window whatever the
+        length of the clip, and every step works on whole (windows, keyframes) arrays.
+
+        Returns the (frames,) index of the keyframe each frame is aligned to.
+        """
+        track = np.asarray(track)
+        frames = len(track)
+        count = len(sequence.landmarks)
+        if frames == 0 or count == 1:
+            return np.zeros(frames, dtype=np.intp)
+        max_step = min(count - 1, max(2, math.ceil(max_step_ratio * count)))
+
+        # Zero-cost padding frames around the track leave both ends of every path free.
+        # Row t of window w is padded[w * block + t].
+        block = max(1, min(block_frames, frames))
+        margin = max(1, margin_frames)
+        windows = -(-frames // block)
+        length = block + 2 * margin
+        span = windows * block
+        padded = np.zeros((span + 2 * margin, count), dtype=np.float32)
+        padded[margin:margin + frames] = self._alignment_costs(track, sequence)
+
+        # distance[t, w, j]: cheapest path through window w that is at keyframe j at step t.
+        # A step adds the minimum over the max_step + 1 keyframes up to j (cyclically) in
+        # the previous step, built by doubling over a copy padded with the last keyframes.
+        distance = np.empty((length, windows, count), dtype=np.float32)
+        distance[0] = padded[0:span:block]
+        behind = np.empty((windows, count + max_step), dtype=np.float32)
+        for t in range(1, length):
+            behind[:, max_step:] = distance[t - 1]
+            behind[:, :max_step] = distance[t - 1, :, count - max_step:]
+            reach, covered = behind, 1
+            while covered <= max_step:
+                shift = min(covered, max_step + 1 - covered)
+                reach = np.minimum(reach[:, shift:], reach[:, :-shift])
+                covered += shift
+            np.add(reach, padded[t:t + span:block], out=distance[t])
+
+        # Walk every window back from its cheapest end, then keep the steps of its block
+        flat = distance.reshape(-1)
+        offsets = np.arange(windows)[:, None] * count
+        steps_back = np.arange(max_step + 1)
+        window_index = np.arange(windows)
+        path = np.empty((length, windows), dtype=np.intp)
+        j = distance[-1].argmin(axis=1)
+        for t in range(length - 1, 0, -1):
+            path[t] = j
+            sources = (j[:, None] - steps_back) % count
+            j = sources[window_index, flat.take((t - 1) * windows * count + offsets + sources).argmin(axis=1)]
+        path[0] = j
+        return np.ascontiguousarray(path[margin:margin + block].T).reshape(-1)[:frames]
+
+    def _alignment_costs(self, track: np.ndarray, sequence: CompiledSequence) -> np.ndarray:
+        """Visibility-weighted mean squared landmark distance of every frame to every keyframe.
+
+        With w = frame visibility x keyframe weight, sum(w |t - p|^2) expands to
+        sum(w |t|^2) + sum(w |p|^2) - 2 sum(w t.p), so the whole (frames, keyframes)
+        matrix is one float32 matrix product of per-frame and per-keyframe features.
+        Coordinates are centered on the keyframes first to keep the expansion exact
+        in float32.
+        """
+        frames = len(track)
+        center = sequence.landmarks[:, :, :3].mean(axis=(0, 1))
+        planes = (sequence.landmarks[:, :, :3] - center).transpose(0, 2, 1)  # (keyframes, 3, 33)
+        weights = sequence.weights
+        keyframe_features = np.concatenate([
+            weights,
+            weights * np.sum(planes ** 2, axis=1),
+            (-2.0 * weights[:, None, :] * planes).reshape(len(planes), -1)
+        ], axis=1).astype(np.float32)
+
+        # [visible |t|^2, visible, visible x, visible y, visible z], one (frames, 33) block each
+        frame_features = np.empty((frames, 5 * NUM_LANDMARKS), dtype=np.float32)
+        squares = frame_features[:, :NUM_LANDMARKS]
+        visible = frame_features[:, NUM_LANDMARKS:2 * NUM_LANDMARKS]
+        coordinates = frame_features[:, 2 * NUM_LANDMARKS:].reshape(frames, 3, NUM_LANDMARKS)
+        np.greater_equal(track[:, :, 3], VISIBILITY_THRESHOLD, out=visible, casting='unsafe')
+        for axis in range(3):
+            np.subtract(track[:, :, axis], center[axis], out=coordinates[:, axis], casting='same_kind')
+        np.einsum('fal,fal->fl', coordinates, coordinates, out=squares)
+        squares *= visible
+        coordinates *= visible[:, None, :]
+
+        # Pairs without a visible weighted landmark have a zero sum and stay at zero cost
+        costs = frame_features @ keyframe_features.T
+        np.maximum(costs, 0.0, out=costs)
+        costs /= np.maximum(visible @ weights.T.astype(np.float32), np.float32(1e-12))
+        return costs
+
+    def sequence_scores(self, track: np.ndarray, sequence: CompiledSequence,
+                        max_step_ratio: float = 0.1) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-frame similarities and joint deviations against the DTW-aligned keyframes"""
+        track = np.asarray(track, dtype=np.float64)
+        alignment = self.align_sequence(track, sequence, max_step_ratio)
+        similarities = self._pair_similarities(
+            track, sequence.landmarks[alignment], sequence.weights[alignment]
+        )
+        deviations = np.abs(self.joint_angles(track) - sequence.joint_angles[alignment])
+        return similarities, deviations
+
+    def frame_similarities(self, track: np.ndarray, template: CompiledTemplate) -> np.ndarray:
+        """Weighted similarity (0-100) of every frame in a (frames, 33, 4) track"""
+        track = np.asarray(track, dtype=np.float64)
+
+        distances = np.sqrt(np.sum((track[:, :, :3] - template.landmarks[None, :, :3]) ** 2, axis=2))
+        similarity = np.maximum(0.0, 1.0 - distances)
+
+        weights = np.where(track[:, :, 3] >= VISIBILITY_THRESHOLD, template.weights, 0.0)
+
+        total_weight = weights.sum(axis=1)
+        total_similarity = (similarity * weights).sum(axis=1)
+
+        scores = np.zeros(len(track), dtype=np.float64)
+        np.divide(total_similarity * 100, total_weight, out=scores, where=total_weight > 0)
+        return scores
+
+    def joint_angles(self, track: np.ndarray) -> np.ndarray:
+        """Joint angles in degrees for every frame, shape (frames, joints)"""
+        track = np.asarray(track, dtype=np.float64)
+        points = track[:, self.joint_indices, :2]  # (frames, joints, 3 points, x/y)
+
+        ba = points[:, :, 0] - points[:, :, 1]
+        bc = points[:, :, 2] - points[:, :, 1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dot = ba[..., 0] * bc[..., 0] + ba[..., 1] * bc[..., 1]
+            norms = np.sqrt(np.sum(ba * ba, axis=-1)) * np.sqrt(np.sum(bc * bc, axis=-1))
+            cosine_angle = np.clip(dot / norms, -1.0, 1.0)
+            return np.degrees(np.arccos(cosine_angle))
+
+    def joints_visible(self, track: np.ndarray) -> np.ndarray:
+        """(frames, joints) mask of joints whose three landmarks are all visible"""
+        return (np.asarray(track)[:, self.joint_indices, 3] >= VISIBILITY_THRESHOLD).all(axis=2)
+
+    def joint_deviations(self, track: np.ndarray, template: CompiledTemplate) -> np.ndarray:
+        """Absolute angle difference to the template for every frame and joint"""
+        return np.abs(self.joint_angles(track) - template.joint_angles)
+
+    def classify_deviations(self, deviations: np.ndarray, template: CompiledTemplate,
+                            thresholds: np.ndarray = None) -> np.ndarray:
+        """Severity code per deviation: 0 none, 1 minor, 2 moderate, 3 critical"""
+        if thresholds is None:
+            thresholds = template.severity_thresholds
+        severities = np.zeros(deviations.shape, dtype=np.int8)
+        with np.errstate(invalid='ignore'):
+            for level in range(len(SEVERITY_LEVELS)):
+                severities[deviations > thresholds[:, level]] = level + 1
+        return severities
+
+    def render_joint_errors(self, deviations: np.ndarray, severities: np.ndarray) -> Dict[str, List[str]]:
+        """Format flagged joints as the per-frame messages the API returns"""
+        errors = {'critical': [], 'moderate': [], 'minor': []}
+        frames, joints = np.nonzero(severities)
+        for frame, joint in zip(frames.tolist(), joints.tolist()):
+            level = SEVERITY_LEVELS[severities[frame, joint] - 1]
+            errors[level].append(
+                f"{self.joint_names[joint]}: {deviations[frame, joint]:.1f}° deviation ({level})"
+            )
+        return errors
+
+class JointErrorAggregator:
+    """Running per-joint error statistics for one scoring session.
+
+    Frames are fed in batches of joint deviations as they arrive; the aggregator
+    keeps per-severity frame counts, the worst and summed deviation and the number
+    of frames each joint spent out of tolerance. Its size depends only on the
+    number of joints, so it suits both whole videos and endless live streams.
+    ``tolerance_multiplier`` widens or tightens every severity threshold, as the
+    difficulty levels in ``api_config.DIFFICULTY_LEVELS`` do.
+    """
+
+    def __init__(self, engine: PoseScoringEngine, template: CompiledTemplate,
+                 tolerance_multiplier: float = 1.0):
+        self.engine = engine
+        self.template = template
+        self.joint_names = engine.joint_names
+        self.thresholds = template.severity_thresholds * tolerance_multiplier
+        joints = len(engine.joint_names)
+        self.frames = 0
+        self.severity_counts = np.zeros((joints, len(SEVERITY_LEVELS)), dtype=np.int64)
+        self.error_frames = np.zeros(joints, dtype=np.int64)
+        self.measured_frames = np.zeros(joints, dtype=np.int64)
+        self.worst_deviation = np.zeros(joints, dtype=np.float64)
+        self.deviation_sum = np.zeros(joints, dtype=np.float64)
+
+    def update(self, deviations: np.ndarray) -> np.ndarray:
+        """Add a (frames, joints) batch of deviations; returns their severity codes"""
+        severities = self.engine.classify_deviations(deviations, self.template, self.thresholds)
+        if not len(deviations):
+            return severities
+
+        for level in range(len(SEVERITY_LEVELS)):
+            self.severity_counts[:, level] += np.count_nonzero(severities == level + 1, axis=0)
+        self.error_frames += np.count_nonzero(severities, axis=0)
+
+        measured = ~np.isnan(deviations)
+        values = np.where(measured, deviations, 0.0)
+        self.measured_frames += measured.sum(axis=0)
+        np.maximum(self.worst_deviation, values.max(axis=0), out=self.worst_deviation)
+        self.deviation_sum += values.sum(axis=0)
+        self.frames += len(deviations)
+        return severities
+
+    @property
+    def mean_deviation(self) -> np.ndarray:
+        mean = np.zeros(len(self.joint_names), dtype=np.float64)
+        np.divide(self.deviation_sum, self.measured_frames, out=mean, where=self.measured_frames > 0)
+        return mean
+
+    @property
+    def time_in_error(self) -> np.ndarray:
+        """Fraction of frames each joint spent out of tolerance"""
+        return self.error_frames / self.frames if self.frames else np.zeros(len(self.joint_names))
+
+    def flagged_joints(self, min_severity: int = 1) -> List[str]:
+        """Names of joints that reached at least the given severity code"""
+        counts = self.severity_counts[:, min_severity - 1:].sum(axis=1)
+        return [name for name, count in zip(self.joint_names, counts.tolist()) if count]
@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from analysis_record import AnalysisRecord
+
+logger = logging.getLogger(__name__)
+
+class SessionCache:
+    """Memory-bounded session store that spills to disk.
+
+    Sessions are kept in least-recently-used order. Once their estimated size
+    exceeds ``max_bytes``, or a session has not been touched for ``ttl_seconds``,
+    it is moved out of memory into ``spill_dir`` as an ``.npz`` file. A lookup
+    that misses memory reloads the session from there and makes it recent again.
+    ``max_bytes=0`` keeps nothing in memory, so every session goes straight to disk.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, spill_dir: str):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = Path(spill_dir)
+        self._entries: "OrderedDict[str, Tuple[AnalysisRecord, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._spilled = {path.stem for path in self.spill_dir.glob("*.npz")}
+
+    def _path(self, session_id: str) -> Optional[Path]:
+        # Session ids come from URLs; never let one point outside spill_dir
+        if not session_id or Path(session_id).name != session_id or session_id.startswith("."):
+            return None
+        return self.spill_dir / f"{session_id}.npz"
+
+    def put(self, record: AnalysisRecord):
+        with self._lock:
+            self._remove_entry(record.session_id)
+            if record.session_id in self._spilled:
+                # The disk copy is stale now; the new record is written on its next spill
+                self._spilled.discard(record.session_id)
+                self._remove_file(self._path(record.session_id))
+            size = record.nbytes
+            self._entries[record.session_id] = (record, size, time.monotonic())
+            self._bytes += size
+            self._evict()
+
+    def get(self, session_id: str) -> Optional[AnalysisRecord]:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                record, size, _ = entry
+                self._entries[session_id] = (record, size, time.monotonic())
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return record
+
+            self.misses += 1
+            if session_id not in self._spilled:
+                # Another worker sharing spill_dir may have written it
+                path = self._path(session_id)
+                if path is None or not path.exists():
+                    return None
+                self._spilled.add(session_id)
+            record = self._load(session_id)
+            if record is None:
+                return None
+            self._entries[session_id] = (record, record.nbytes, time.monotonic())
+            self._bytes += record.nbytes
+            self._evict()
+            return record
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            found = self._remove_entry(session_id)
+            if session_id in self._spilled:
+                self._spilled.discard(session_id)
+                self._remove_file(self._path(session_id))
+                found = True
+            return found
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(dict.fromkeys([*self._spilled, *self._entries]))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._spilled | self._entries.keys())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire()
+            return {
+                "in_memory": len(self._entries),
+                "on_disk": len(self._spilled),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def _remove_entry(self, session_id: str) -> bool:
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    def _evict(self):
+        """Spill least recently used sessions until memory is back under budget"""
+        self._expire()
+        while self._entries and self._bytes > self.max_bytes:
+            session_id, (record, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._spill(record)
+            self.evictions += 1
+
+    def _expire(self):
+        if not self.ttl_seconds:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            session_id, (record, size, last_used) = next(iter(self._entries.items()))
+            if last_used > deadline:
+                break
+            self._entries.popitem(last=False)
+            self._bytes -= size
+            self._spill(record)
+            self.expirations += 1
+
+    def _spill(self, record: AnalysisRecord):
+        if record.session_id in self._spilled:
+            return  # unchanged since it was loaded from disk
+        path = self._path(record.session_id)
+        if path is None:
+            return
+        temp_path = self.spill_dir / f".{record.session_id}.{uuid.uuid4().hex}.tmp"
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(record.to_bytes())
+            os.replace(temp_path, path)
+            self._spilled.add(record.session_id)
+        except OSError as e:
+            logger.error(f"Could not spill session {record.session_id}, dropping it: {e}")
+            self._remove_file(temp_path)
+
+    def _load(self, session_id: str) -> Optional[AnalysisRecord]:
+        path = self._path(session_id)
+        try:
+            with open(path, "rb") as f:
+                return AnalysisRecord.from_bytes(f.read())
+        except Exception as e:
+            logger.warning(f"Dropping unreadable spilled session {path}: {e}")
+            self._spilled.discard(session_id)
+            self._remove_file(path)
+            return None
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
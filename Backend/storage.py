@@ -0,0 +1,398 @@
+import base64
+import bisect
+from abc import ABC, abstractmethod
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from analysis_record import AnalysisRecord
+from scoring_engine import LANDMARK_FIELDS, NUM_LANDMARKS
+from session_cache import SessionCache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_LOG_FILENAME = "templates.jsonl"
+
+class TemplateRecord(NamedTuple):
+    template_id: str
+    name: str
+    description: Optional[str]
+    created_at: Optional[str]
+    landmarks: np.ndarray  # (33, 4) float32
+    keyframes: Optional[np.ndarray] = None  # (keyframes, 33, 4) float32 for movement templates
+
+class StorageBackend(ABC):
+    """Where templates and analysis sessions are persisted.
+
+    Templates are append-only and read incrementally: ``read_templates`` takes the
+    cursor returned by its previous call, so every worker process can pick up
+    templates added by the others. Sessions are keyed by session id, and video
+    analysis jobs by job id (as JSON documents, so any worker can report on them).
+    """
+
+    @abstractmethod
+    def read_templates(self, cursor: int) -> Tuple[List[TemplateRecord], int]:
+        """Return templates added after ``cursor`` and the cursor to continue from"""
+        ...
+
+    @abstractmethod
+    def append_template(self, record: TemplateRecord):
+        ...
+
+    @abstractmethod
+    def put_sessions(self, records: List[AnalysisRecord]):
+        ...
+
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[AnalysisRecord]:
+        ...
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session; returns False if it did not exist"""
+        ...
+
+    @abstractmethod
+    def session_page(self, after: Optional[str], limit: int) -> List[str]:
+        """Up to ``limit`` session ids in id order, starting after ``after``"""
+        ...
+
+    @abstractmethod
+    def session_count(self) -> int:
+        ...
+
+    @abstractmethod
+    def put_job(self, job_id: str, data: str, updated_at: float):
+        """Insert or replace the JSON document of a job"""
+        ...
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def expire_jobs(self, before: float) -> int:
+        """Delete jobs last updated before ``before``; returns how many were removed"""
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        """Backend counters reported by /health"""
+        return {}
+
+    def close(self):
+        pass
+
+def _encode_landmarks(landmarks: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(landmarks, dtype="<f4").tobytes()).decode("ascii")
+
+def _decode_landmarks(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f4").reshape(NUM_LANDMARKS, LANDMARK_FIELDS)
+
+def _decode_keyframes(data: Optional[bytes]) -> Optional[np.ndarray]:
+    if not data:
+        return None
+    return np.frombuffer(data, dtype="<f4").reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS)
+
+def read_template_log(path: Path, offset: int) -> Tuple[List[TemplateRecord], int]:
+    """Read the complete ``templates.jsonl`` lines after byte ``offset``"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+
+    # Only consume complete lines; a concurrent writer may be mid-append
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            keyframes = record.get("keyframes")
+            records.append(TemplateRecord(
+                record["id"], record["name"], record.get("description"),
+                record.get("created_at"), _decode_landmarks(base64.b64decode(record["landmarks"])),
+                _decode_keyframes(base64.b64decode(keyframes)) if keyframes else None
+            ))
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Skipping corrupt template record: {e}")
+    return records, offset + end
+
+class LocalStorage(StorageBackend):
+    """Default single-host backend: templates in an append-only JSONL file, sessions in a SessionCache.
+
+    Each template is one line of ``templates.jsonl`` holding its metadata and its
+    landmarks (and keyframes, if any) as base64-encoded little-endian float32, and the cursor is a byte
+    offset into that file. Sessions stay in memory within the cache's budget and
+    TTL and are spilled to its directory beyond that.
+    """
+
+    def __init__(self, templates_dir: str, sessions: SessionCache):
+        self.directory = Path(templates_dir)
+        self.index_path = self.directory / TEMPLATE_LOG_FILENAME
+        self.sessions = sessions
+        self._jobs: Dict[str, Tuple[float, str]] = {}  # job id -> (updated_at, JSON)
+        self._jobs_lock = threading.Lock()
+
+    def read_templates(self, cursor: int) -> Tuple[List[TemplateRecord], int]:
+        return read_template_log(self.index_path, cursor)
+
+    def append_template(self, record: TemplateRecord):
+        entry = {
+            "id": record.template_id,
+            "name": record.name,
+            "description": record.description,
+            "created_at": record.created_at,
+            "landmarks": _encode_landmarks(record.landmarks)
+        }
+        if record.keyframes is not None:
+            entry["keyframes"] = _encode_landmarks(record.keyframes)
+        line = json.dumps(entry) + "\n"
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, "ab") as f:
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def put_sessions(self, records: List[AnalysisRecord]):
+        for record in records:
+            self.sessions.put(record)
+
+    def get_session(self, session_id: str) -> Optional[AnalysisRecord]:
+        return self.sessions.get(session_id)
+
+    def delete_session(self, session_id: str) -> bool:
+        return self.sessions.delete(session_id)
+
+    def session_page(self, after: Optional[str], limit: int) -> List[str]:
+        ids = sorted(self.sessions.ids())
+        start = bisect.bisect_right(ids, after) if after is not None else 0
+        return ids[start:start + limit]
+
+    def session_count(self) -> int:
+        return len(self.sessions)
+
+    def put_job(self, job_id: str, data: str, updated_at: float):
+        with self._jobs_lock:
+            self._jobs[job_id] = (updated_at, data)
+
+    def get_job(self, job_id: str) -> Optional[str]:
+        with self._jobs_lock:
+            entry = self._jobs.get(job_id)
+        return entry[1] if entry else None
+
+    def expire_jobs(self, before: float) -> int:
+        with self._jobs_lock:
+            expired = [job_id for job_id, (updated_at, _) in self._jobs.items() if updated_at < before]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        return self.sessions.stats()
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at TEXT,
+    landmarks BLOB NOT NULL,
+    keyframes BLOB
+);
+CREATE INDEX IF NOT EXISTS templates_created_at ON templates (created_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+"""
+
+class SQLiteStorage(StorageBackend):
+    """Templates, sessions and jobs in one SQLite database shared by every worker process.
+
+    The database runs in WAL mode, so readers in other workers never wait for a
+    writer. Session writes are buffered and committed in batches by a background
+    thread at most ``flush_interval`` seconds later (sooner once ``batch_size``
+    are pending); lookups check the buffer first so a worker always sees its own
+    writes. Template writes are committed immediately.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.05, batch_size: int = 256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: Dict[str, AnalysisRecord] = {}
+        self._flushing: Dict[str, AnalysisRecord] = {}
+        self._wake = threading.Event()
+        self._closed = False
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SQLITE_SCHEMA)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(templates)")}
+        if "keyframes" not in columns:
+            # Databases created before movement templates existed
+            with connection:
+                connection.execute("ALTER TABLE templates ADD COLUMN keyframes BLOB")
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-session-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection; sqlite3 connections must not be shared across threads"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def read_templates(self, cursor: int) -> Tuple[List[TemplateRecord], int]:
+        rows = self._connection().execute(
+            "SELECT seq, id, name, description, created_at, landmarks, keyframes FROM templates "
+            "WHERE seq > ? ORDER BY seq",
+            (cursor,)
+        ).fetchall()
+        records = [
+            TemplateRecord(template_id, name, description, created_at,
+                           _decode_landmarks(landmarks), _decode_keyframes(keyframes))
+            for _, template_id, name, description, created_at, landmarks, keyframes in rows
+        ]
+        return records, rows[-1][0] if rows else cursor
+
+    def append_template(self, record: TemplateRecord):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO templates (id, name, description, created_at, landmarks, keyframes) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (record.template_id, record.name, record.description, record.created_at,
+                 np.ascontiguousarray(record.landmarks, dtype="<f4").tobytes(),
+                 None if record.keyframes is None
+                 else np.ascontiguousarray(record.keyframes, dtype="<f4").tobytes())
+            )
+
+    def put_sessions(self, records: List[AnalysisRecord]):
+        with self._lock:
+            for record in records:
+                self._pending[record.session_id] = record
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def get_session(self, session_id: str) -> Optional[AnalysisRecord]:
+        with self._lock:
+            record = self._pending.get(session_id) or self._flushing.get(session_id)
+        if record is not None:
+            return record
+        row = self._connection().execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return AnalysisRecord.from_bytes(row[0]) if row else None
+
+    def delete_session(self, session_id: str) -> bool:
+        self.flush()
+        connection = self._connection()
+        with connection:
+            deleted = connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+        return deleted > 0
+
+    def session_page(self, after: Optional[str], limit: int) -> List[str]:
+        self.flush()
+        rows = self._connection().execute(
+            "SELECT id FROM sessions WHERE id > ? ORDER BY id LIMIT ?", (after or "", limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def session_count(self) -> int:
+        self.flush()
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def put_job(self, job_id: str, data: str, updated_at: float):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, updated_at, data) VALUES (?, ?, ?)", (job_id, updated_at, data)
+            )
+
+    def get_job(self, job_id: str) -> Optional[str]:
+        row = self._connection().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def expire_jobs(self, before: float) -> int:
+        connection = self._connection()
+        with connection:
+            return connection.execute("DELETE FROM jobs WHERE updated_at < ?", (before,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending_writes": len(self._pending) + len(self._flushing)}
+
+    def flush(self):
+        """Commit all buffered session writes in one transaction"""
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._flushing, self._pending = self._pending, {}
+            rows = [(record.session_id, record.created_at, record.to_bytes())
+                    for record in self._flushing.values()]
+            try:
+                connection = self._connection()
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO sessions (id, created_at, data) VALUES (?, ?, ?)", rows
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Could not write {len(rows)} sessions, will retry: {e}")
+                with self._lock:
+                    self._pending = {**self._flushing, **self._pending}
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5.0)
+        self.flush()
+
+def create_storage(database_url: Optional[str], templates_dir: str, sessions_dir: str,
+                   session_memory_bytes: int, session_ttl_seconds: float) -> StorageBackend:
+    """Pick the storage backend for ``settings.database_url``.
+
+    No URL keeps the local backend (JSONL templates, sessions in memory up to
+    ``session_memory_bytes`` and spilled to ``sessions_dir``); ``sqlite:///path/to.db``
+    selects the shared SQLite backend.
+    """
+    if not database_url:
+        return LocalStorage(templates_dir, SessionCache(session_memory_bytes, session_ttl_seconds, sessions_dir))
+    if database_url.startswith("sqlite:///"):
+        return SQLiteStorage(database_url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported database_url {database_url!r}; only sqlite:/// URLs are implemented")
@@ -0,0 +1,174 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from scoring_engine import LANDMARK_FIELDS, NUM_LANDMARKS
+from storage import TEMPLATE_LOG_FILENAME, LocalStorage, StorageBackend, TemplateRecord, read_template_log
+
+logger = logging.getLogger(__name__)
+
+class StoredTemplate:
+    """Template metadata, its landmarks as a read-only (33, 4) float32 array and its compiled scoring form.
+
+    Movement templates also keep a read-only (keyframes, 33, 4) keyframe sequence.
+    """
+
+    __slots__ = ("template_id", "name", "description", "created_at", "landmarks", "keyframes", "compiled")
+
+    def __init__(self, template_id: str, name: str, description: Optional[str],
+                 created_at: Optional[str], landmarks: np.ndarray,
+                 keyframes: Optional[np.ndarray] = None, compiled: Any = None):
+        self.template_id = template_id
+        self.name = name
+        self.description = description
+        self.created_at = created_at
+        landmarks.flags.writeable = False
+        self.landmarks = landmarks
+        if keyframes is not None:
+            keyframes.flags.writeable = False
+        self.keyframes = keyframes
+        self.compiled = compiled
+
+    def landmark_dicts(self) -> List[Dict[str, float]]:
+        return _landmark_dicts(self.landmarks)
+
+    def keyframe_dicts(self) -> Optional[List[List[Dict[str, float]]]]:
+        if self.keyframes is None:
+            return None
+        return [_landmark_dicts(keyframe) for keyframe in self.keyframes]
+
+def _landmark_dicts(landmarks: np.ndarray) -> List[Dict[str, float]]:
+    return [
+        {"x": float(x), "y": float(y), "z": float(z), "visibility": float(v)}
+        for x, y, z, v in landmarks.tolist()
+    ]
+
+class TemplateStore:
+    """Template cache in front of a StorageBackend.
+
+    Templates are loaded at startup with one sequential read and lookups are served
+    from memory. Other worker processes add templates to the same backend; a lookup
+    miss picks up their additions before giving up. Per-template ``*.json`` files
+    written by older versions, and ``templates.jsonl`` when another backend is
+    configured, are imported from ``directory`` on load.
+
+    ``compiler`` turns a stack of (n, 33, 4) landmark arrays into scoring objects;
+    templates are compiled once, in batches, as they are loaded or created.
+    ``sequence_compiler`` then attaches the keyframes of movement templates to
+    their compiled form.
+    """
+
+    def __init__(self, storage: StorageBackend, directory: str,
+                 compiler: Optional[Callable[[np.ndarray], List[Any]]] = None,
+                 sequence_compiler: Optional[Callable[[Any, np.ndarray], Any]] = None):
+        self.storage = storage
+        self.directory = Path(directory)
+        self.compiler = compiler
+        self.sequence_compiler = sequence_compiler
+        self._templates: Dict[str, StoredTemplate] = {}
+        self._order: List[StoredTemplate] = []  # insertion order, for stable paging
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """Hydrate the store from the backend; returns the number of templates loaded"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._read_new_templates()
+        self._import_legacy_files()
+        return len(self._templates)
+
+    def _read_new_templates(self):
+        records, self._cursor = self.storage.read_templates(self._cursor)
+        loaded = [StoredTemplate(*record) for record in records]
+
+        if loaded and self.compiler is not None:
+            compiled = self.compiler(np.stack([template.landmarks for template in loaded]))
+            for template, compiled_template in zip(loaded, compiled):
+                if template.keyframes is not None and self.sequence_compiler is not None:
+                    compiled_template = self.sequence_compiler(compiled_template, template.keyframes)
+                template.compiled = compiled_template
+        for template in loaded:
+            if template.template_id not in self._templates:
+                self._order.append(template)
+            self._templates[template.template_id] = template
+
+    def _import_legacy_files(self):
+        if not isinstance(self.storage, LocalStorage):
+            records, _ = read_template_log(self.directory / TEMPLATE_LOG_FILENAME, 0)
+            for record in records:
+                if record.template_id not in self._templates:
+                    self.add(*record)
+
+        for path in sorted(self.directory.glob("*.json")):
+            template_id = path.stem
+            if template_id in self._templates:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                landmarks = np.array(
+                    [(lm["x"], lm["y"], lm["z"], lm["visibility"]) for lm in data["landmarks"]],
+                    dtype=np.float32
+                )
+                keyframes = None
+                if data.get("keyframes"):
+                    keyframes = np.array(
+                        [[(lm["x"], lm["y"], lm["z"], lm["visibility"]) for lm in keyframe]
+                         for keyframe in data["keyframes"]],
+                        dtype=np.float32
+                    )
+                created_at = data.get("created_at")
+                self.add(template_id, data["name"], data.get("description"),
+                         str(created_at) if created_at is not None else None, landmarks, keyframes)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Could not import legacy template {path}: {e}")
+
+    def add(self, template_id: str, name: str, description: Optional[str],
+            created_at: Optional[str], landmarks: np.ndarray,
+            keyframes: Optional[np.ndarray] = None) -> StoredTemplate:
+        """Persist a new template and make it available for lookups"""
+        landmarks = np.array(landmarks, dtype=np.float32).reshape(NUM_LANDMARKS, LANDMARK_FIELDS)
+        if keyframes is not None:
+            keyframes = np.array(keyframes, dtype=np.float32).reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS)
+        record = TemplateRecord(template_id, name, description, created_at, landmarks, keyframes)
+
+        with self._lock:
+            # Pick up other workers' additions first so the cursor stays aligned
+            self._read_new_templates()
+            self.storage.append_template(record)
+            self._read_new_templates()
+            template = self._templates.get(template_id)
+
+        return template
+
+    def get(self, template_id: str) -> Optional[StoredTemplate]:
+        """Look up a template, re-reading the backend if another worker may have added it"""
+        template = self._templates.get(template_id)
+        if template is None:
+            with self._lock:
+                self._read_new_templates()
+            template = self._templates.get(template_id)
+        return template
+
+    def refresh(self):
+        """Pick up templates other workers have added since the last read"""
+        with self._lock:
+            self._read_new_templates()
+
+    def page(self, offset: int, limit: int) -> List[StoredTemplate]:
+        """Templates in creation order, starting at ``offset``"""
+        return self._order[offset:offset + limit]
+
+    def __contains__(self, template_id: str) -> bool:
+        return self.get(template_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def values(self) -> Iterator[StoredTemplate]:
+        return iter(list(self._templates.values()))
@@ -0,0 +1,51 @@
+"""Profilers overlapping on several threads, as profiled jobs do on the callback pool."""
+import threading
+import tracemalloc
+
+import pytest
+
+from profiling import Profiler, ProfilerBusyError
+
+def allocate(entered: threading.Event, release: threading.Event):
+    entered.set()
+    release.wait(5)
+    return [bytearray(1024) for _ in range(256)]
+
+def test_overlapping_profiles_run_one_after_another():
+    reports, errors = [], []
+    first_entered, second_started, release = threading.Event(), threading.Event(), threading.Event()
+
+    def profile(entered: threading.Event):
+        try:
+            profiler = Profiler(top_entries=5)
+            with profiler:
+                allocate(entered, release)
+            reports.append(profiler.report())
+        except Exception as e:
+            errors.append(e)
+
+    first = threading.Thread(target=profile, args=(first_entered,))
+    first.start()
+    assert first_entered.wait(5)
+    second = threading.Thread(target=profile, args=(second_started,))
+    second.start()
+    # The second profile waits for the first instead of sharing tracemalloc with it
+    assert not second_started.wait(0.2)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert errors == []
+    assert len(reports) == 2
+    assert all(report["peak_memory_bytes"] >= 256 * 1024 for report in reports)
+    assert not tracemalloc.is_tracing()
+
+def test_profile_without_wait_is_rejected_while_another_runs():
+    with Profiler(top_entries=5):
+        with pytest.raises(ProfilerBusyError):
+            with Profiler(top_entries=5, wait=False):
+                pass
+    # Released again once the running profile exits
+    with Profiler(top_entries=5, wait=False) as profiler:
+        pass
+    assert profiler.report()["wall_seconds"] >= 0
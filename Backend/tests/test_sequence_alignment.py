@@ -0,0 +1,92 @@
+"""DTW alignment of multi-rep tracks against one-rep movement templates.
+
+Run from ``Backend/`` with ``python -m pytest tests``.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from api_config import get_settings
+from benchmarks.synthetic import synthetic_track
+from scoring_engine import PoseScoringEngine
+
+FPS = 30
+PERIOD_SECONDS = 2.0
+REP_FRAMES = int(FPS * PERIOD_SECONDS)
+
+@pytest.fixture(scope="module")
+def engine():
+    joints = {
+        'left_knee': (23, 25, 27),
+        'right_knee': (24, 26, 28),
+        'left_hip': (11, 23, 25),
+        'right_hip': (12, 24, 26),
+    }
+    return PoseScoringEngine(joints, get_settings().joint_angle_tolerances)
+
+@pytest.fixture(scope="module")
+def one_rep():
+    return synthetic_track(REP_FRAMES, fps=FPS, period_seconds=PERIOD_SECONDS, noise=0.0, seed=3)
+
+@pytest.mark.parametrize("phase", [0, 17])
+def test_repeated_template_motion_aligns_exactly(engine, one_rep, phase):
+    # Ten reps of exactly the template's motion, starting `phase` frames into a rep
+    track = np.tile(one_rep, (10, 1, 1))[phase:]
+    sequence = engine.compile_sequence(one_rep)
+
+    alignment = engine.align_sequence(track, sequence)
+    similarities, deviations = engine.sequence_scores(track, sequence)
+
+    np.testing.assert_array_equal(alignment, (np.arange(len(track)) + phase) % REP_FRAMES)
+    assert np.nanmax(deviations) < 1e-6
+    assert similarities.min() > 99.9
+
+def test_noisy_reps_stay_close_to_template(engine, one_rep):
+    track = synthetic_track(10 * REP_FRAMES + 23, fps=FPS, period_seconds=PERIOD_SECONDS, seed=1)[23:]
+    _, deviations = engine.sequence_scores(track, engine.compile_sequence(one_rep))
+
+    knees = deviations[:, [engine.joint_names.index('left_knee'), engine.joint_names.index('right_knee')]]
+    assert np.nanmedian(knees) < 6
+    assert np.nanpercentile(knees, 95) < 20
+
+def test_single_keyframe_and_empty_track(engine, one_rep):
+    assert engine.align_sequence(one_rep[:0], engine.compile_sequence(one_rep)).shape == (0,)
+    alignment = engine.align_sequence(one_rep, engine.compile_sequence(one_rep[:1]))
+    np.testing.assert_array_equal(alignment, np.zeros(len(one_rep)))
+
+def exact_alignment(engine, track, sequence, max_step_ratio=0.1):
+    """The same cyclic DP over the whole track at once, one frame per Python step"""
+    count = len(sequence.landmarks)
+    max_step = min(count - 1, max(2, int(np.ceil(max_step_ratio * count))))
+    sources = (np.arange(count) - np.arange(max_step + 1)[:, None]) % count
+    distance = engine._alignment_costs(track, sequence).astype(np.float64)
+    for i in range(1, len(distance)):
+        distance[i] += distance[i - 1][sources].min(axis=0)
+    alignment = np.empty(len(distance), dtype=np.intp)
+    j = int(distance[-1].argmin())
+    for i in range(len(distance) - 1, 0, -1):
+        alignment[i] = j
+        candidates = (j - np.arange(max_step + 1)) % count
+        j = int(candidates[distance[i - 1][candidates].argmin()])
+    alignment[0] = j
+    return alignment
+
+@pytest.mark.parametrize("keyframes, period_seconds", [(60, 2.0), (200, 3.5)])
+def test_windowed_alignment_matches_whole_track_dp(engine, keyframes, period_seconds):
+    sequence = engine.compile_sequence(synthetic_track(keyframes, fps=keyframes / period_seconds,
+                                                       period_seconds=period_seconds, seed=3))
+    track = synthetic_track(1500, fps=FPS, period_seconds=period_seconds * 0.9, seed=5)
+
+    alignment = engine.align_sequence(track, sequence)
+    assert np.mean(alignment != exact_alignment(engine, track, sequence)) < 0.01
+
+def test_long_clip_aligns_in_milliseconds(engine):
+    # 10k frames against 200 keyframes ran for about 0.6 s with a per-frame DP loop
+    sequence = engine.compile_sequence(synthetic_track(200, fps=100, seed=3))
+    track = synthetic_track(10_000, seed=1)
+    engine.align_sequence(track[:500], sequence)
+
+    started = time.perf_counter()
+    engine.align_sequence(track, sequence)
+    assert time.perf_counter() - started < 0.3
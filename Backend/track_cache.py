@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def read_track_file(path) -> Tuple[np.ndarray, int, int, float, Optional[np.ndarray]]:
+    """Load ``(track, total_frames, sampled_frames, fps, frame_times)`` from a track ``.npz`` file.
+
+    Files written before frame times were kept return None for them.
+    """
+    with np.load(path) as data:
+        return (data["track"], int(data["total_frames"]), int(data["sampled_frames"]),
+                float(data["fps"]) if "fps" in data.files else 0.0,
+                data["frame_times"] if "frame_times" in data.files else None)
+
+def write_track_file(path, track: np.ndarray, total_frames: int, sampled_frames: int, fps: float = 0.0,
+                     frame_times: Optional[np.ndarray] = None):
+    """Write a track as an uncompressed ``.npz`` file, atomically so readers never see a partial one"""
+    path = Path(path)
+    temp_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.tmp")
+    extra = {} if frame_times is None else {"frame_times": np.asarray(frame_times, dtype=np.float64)}
+    try:
+        with open(temp_path, "wb") as f:
+            np.savez(f, track=np.asarray(track, dtype=np.float32),
+                     total_frames=total_frames, sampled_frames=sampled_frames, fps=fps, **extra)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+class PoseTrackCache:
+    """Content-addressed on-disk cache of extracted landmark tracks.
+
+    Entries are uncompressed ``.npz`` files holding the (frames, 33, 4) float32 track,
+    its frame counts, its sampling rate and the video time of each frame, named after a hash of the video content and the pose
+    settings used. The directory is kept under ``max_bytes`` by deleting the least
+    recently used entries; a hit refreshes the entry's mtime. Several processes may
+    share one directory since entries are written atomically.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content_digest: str, **pose_settings) -> str:
+        """Cache key for a video's content hash combined with the settings that shaped its track"""
+        settings_part = ",".join(f"{name}={pose_settings[name]!r}" for name in sorted(pose_settings))
+        return hashlib.sha256(f"{content_digest}|{settings_part}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int, int, float, Optional[np.ndarray]]]:
+        """Return ``(track, total_frames, sampled_frames, fps, frame_times)`` for a cached key, or None"""
+        path = self._path(key)
+        try:
+            entry = read_track_file(path)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable pose track cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, track: np.ndarray, total_frames: int, sampled_frames: int, fps: float = 0.0,
+            frame_times: Optional[np.ndarray] = None):
+        """Store a track, then evict old entries if the cache is over budget"""
+        if self.max_bytes <= 0:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            write_track_file(self._path(key), track, total_frames, sampled_frames, fps, frame_times)
+        except OSError as e:
+            logger.warning(f"Could not write pose track cache entry: {e}")
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".npz"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,209 @@
+import time
+
+import cv2
+import numpy as np
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from job_queue import JobInputError
+from metrics import StageTimer
+from pose_pool import PosePool
+from scoring_engine import LandmarkTrackBuilder
+from track_cache import PoseTrackCache
+
+# Each worker process analyzes one video at a time, so one Pose per setting is enough
+_worker_pose_pool = PosePool(max_per_key=1)
+_worker_track_caches: Dict[Tuple[str, int], PoseTrackCache] = {}
+
+class PoseTrack(NamedTuple):
+    landmarks: np.ndarray  # (frames with a pose, 33, 4) float32
+    total_frames: int
+    sampled_frames: int
+    fps: float = 0.0  # rate of the analyzed frames, 0 if unknown
+    frame_times: Optional[np.ndarray] = None  # (frames with a pose,) seconds into the video; None if unknown
+    cached: bool = False
+    stage_durations: Optional[Dict[str, float]] = None  # seconds spent per stage in the worker
+
+class FramePreprocessor:
+    """Decode, downscale and color-convert frames for pose inference.
+
+    Frames whose long edge exceeds ``max_long_edge`` are shrunk (keeping the aspect
+    ratio, so normalized landmark coordinates stay comparable) before the BGR->RGB
+    conversion. The decode, resize and RGB buffers are allocated once and reused
+    for every frame of the same size.
+    """
+
+    def __init__(self, max_long_edge: Optional[int] = None):
+        self.max_long_edge = max_long_edge
+        self._frame = None
+        self._resized = None
+        self._rgb = None
+
+    def read(self, cap) -> Optional[np.ndarray]:
+        """Decode the next frame into the reusable frame buffer"""
+        success, frame = cap.read(self._frame)
+        if not success:
+            return None
+        self._frame = frame
+        return frame
+
+    def to_rgb(self, frame: np.ndarray) -> np.ndarray:
+        """Return the frame resized for inference and converted to RGB"""
+        return self.convert(self.resize(frame))
+
+    def resize(self, frame: np.ndarray) -> np.ndarray:
+        """Shrink the frame to ``max_long_edge``; smaller frames are returned as-is"""
+        height, width = frame.shape[:2]
+        long_edge = max(height, width)
+
+        if self.max_long_edge and long_edge > self.max_long_edge:
+            scale = self.max_long_edge / long_edge
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            if self._resized is None or self._resized.shape[1::-1] != size:
+                self._resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            cv2.resize(frame, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            frame = self._resized
+        return frame
+
+    def convert(self, frame: np.ndarray) -> np.ndarray:
+        """BGR->RGB into the reusable RGB buffer"""
+        if self._rgb is None or self._rgb.shape != frame.shape:
+            self._rgb = np.empty(frame.shape, dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
+
+def infer_encoded_frame(pose, preprocessor: FramePreprocessor, payload: bytes) -> Optional[np.ndarray]:
+    """Decode one JPEG/PNG image and return its (33, 4) landmarks, or None if no pose was found"""
+    frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image")
+
+    results = pose.process(preprocessor.to_rgb(frame))
+    if not results.pose_landmarks:
+        return None
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+def frame_stride(source_fps: float, target_fps: Optional[float]) -> int:
+    """Number of decoded frames per analyzed frame needed to sample at ``target_fps``"""
+    if not target_fps or not source_fps or source_fps <= target_fps:
+        return 1
+    return max(1, int(round(source_fps / target_fps)))
+
+def extract_pose_track(video_path: str, model_complexity: int = 2,
+                       min_detection_confidence: float = 0.7,
+                       min_tracking_confidence: float = 0.5,
+                       target_fps: Optional[float] = None,
+                       default_fps: float = 30,
+                       max_long_edge: Optional[int] = None) -> PoseTrack:
+    """Decode a video and run pose inference on it.
+
+    Runs inside a process-pool worker. When ``target_fps`` is set only every n-th
+    frame is decoded and analyzed; the others are skipped with ``cap.grab()``.
+    Frames are downscaled to ``max_long_edge`` before inference.
+    Returns the landmark track of frames where a pose was found, with the time of
+    each of those frames in the video, together with the total number of frames in
+    the video, the number of frames analyzed and the time spent decoding, resizing,
+    color-converting and in pose inference.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise JobInputError("Could not open video file")
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or default_fps
+    stride = frame_stride(source_fps, target_fps)
+    capacity = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // stride + 1
+    track = LandmarkTrackBuilder(capacity=capacity)
+    frame_indices = []
+    preprocessor = FramePreprocessor(max_long_edge)
+    frame_count = 0
+    sampled_frames = 0
+    decode_time = resize_time = convert_time = pose_time = 0.0
+    clock = time.perf_counter
+
+    try:
+        with _worker_pose_pool.checkout(model_complexity, min_detection_confidence,
+                                        min_tracking_confidence) as pose:
+            while True:
+                started = clock()
+                if frame_count % stride:
+                    # Skipped frames are demuxed but never decoded or color-converted
+                    grabbed = cap.grab()
+                    decode_time += clock() - started
+                    if not grabbed:
+                        break
+                    frame_count += 1
+                    continue
+
+                frame = preprocessor.read(cap)
+                decoded = clock()
+                decode_time += decoded - started
+                if frame is None:
+                    break
+
+                frame = preprocessor.resize(frame)
+                resized = clock()
+                rgb = preprocessor.convert(frame)
+                converted = clock()
+                results = pose.process(rgb)
+                inferred = clock()
+                resize_time += resized - decoded
+                convert_time += converted - resized
+                pose_time += inferred - converted
+
+                if results.pose_landmarks:
+                    track.append(results.pose_landmarks.landmark)
+                    frame_indices.append(frame_count)
+
+                frame_count += 1
+                sampled_frames += 1
+    finally:
+        cap.release()
+    if frame_count == 0:
+        raise JobInputError("Could not decode any frame of the video file")
+
+    stage_durations = {"decode": decode_time, "resize": resize_time, "cvtColor": convert_time, "pose": pose_time}
+    return PoseTrack(track.array().copy(), frame_count, sampled_frames, source_fps / stride,
+                     np.array(frame_indices, dtype=np.float64) / source_fps, stage_durations=stage_durations)
+
+def load_or_extract_pose_track(video_path: str, content_digest: str,
+                               cache_dir: str, cache_max_bytes: int,
+                               model_complexity: int = 2,
+                               min_detection_confidence: float = 0.7,
+                               min_tracking_confidence: float = 0.5,
+                               target_fps: Optional[float] = None,
+                               default_fps: float = 30,
+                               max_long_edge: Optional[int] = None) -> PoseTrack:
+    """Return the cached track for this video content and pose settings, extracting it on a miss.
+
+    The cache lookup is reported as the ``cache`` stage next to the extraction stages.
+    """
+    timer = StageTimer()
+    cache_id = (cache_dir, cache_max_bytes)
+    if cache_id not in _worker_track_caches:
+        _worker_track_caches[cache_id] = PoseTrackCache(cache_dir, cache_max_bytes)
+    cache = _worker_track_caches[cache_id]
+
+    key = PoseTrackCache.make_key(
+        content_digest,
+        model_complexity=model_complexity,
+        min_detection_confidence=min_detection_confidence,
+        min_tracking_confidence=min_tracking_confidence,
+        target_fps=target_fps,
+        default_fps=default_fps,
+        max_long_edge=max_long_edge
+    )
+    if cache.max_bytes > 0:
+        with timer.stage("cache"):
+            cached = cache.get(key)
+        if cached is not None:
+            return PoseTrack(*cached, cached=True, stage_durations=timer.durations)
+
+    track = extract_pose_track(
+        video_path, model_complexity, min_detection_confidence, min_tracking_confidence,
+        target_fps, default_fps, max_long_edge
+    )
+    with timer.stage("cache"):
+        cache.put(key, track.landmarks, track.total_frames, track.sampled_frames, track.fps, track.frame_times)
+    return track._replace(stage_durations={**track.stage_durations, **timer.durations})
@@ -88,18 +88,23 @@ const CreateExercise: React.FC = () => {
     // fetch templates from backend to allow selecting existing template for analysis
     const fetchTemplates = async () => {
       try {
-        const res = await fetch(`${API_BASE}/templates`);
-        if (!res.ok) return;
-        const data = await res.json();
-        // backend returns { templates: { id: templateObj, ... } }
-        const tpl = data.templates || {};
+        // backend returns pages of { templates: [{ id, name, description, created_at }], next_cursor }
         const items: Array<{ id: string; name: string; description?: string }> = [];
-        if (Array.isArray(tpl)) {
-          // in case backend returns list
-          tpl.forEach((t: any) => items.push({ id: t.id || '', name: t.name || 'Template', description: t.description }));
-        } else {
-          Object.entries(tpl).forEach(([id, t]: any) => items.push({ id, name: (t as any).name || id, description: (t as any).description }));
-        }
+        let cursor: string | null = null;
+        do {
+          const query = cursor ? `?limit=500&cursor=${encodeURIComponent(cursor)}` : '?limit=500';
+          const res = await fetch(`${API_BASE}/templates${query}`);
+          if (!res.ok) return;
+          const data = await res.json();
+          const tpl = data.templates || {};
+          if (Array.isArray(tpl)) {
+            tpl.forEach((t: any) => items.push({ id: t.id || '', name: t.name || 'Template', description: t.description }));
+          } else {
+            // older backends return { templates: { id: templateObj, ... } }
+            Object.entries(tpl).forEach(([id, t]: any) => items.push({ id, name: (t as any).name || id, description: (t as any).description }));
+          }
+          cursor = data.next_cursor || null;
+        } while (cursor);
         // fallback sample templates if none returned
         const sampleTemplates = [
           { id: 'TEMPLATE-001', name: 'Standard Squat', description: 'Squat reference template' },
@@ -141,8 +146,22 @@ const CreateExercise: React.FC = () => {
         method: 'POST',
         body: formData
       });
-      const json = await res.json();
-      if (!res.ok) throw new Error(json.detail || 'Analysis failed');
+      const job = await res.json();
+      if (!res.ok) throw new Error(job.detail || 'Analysis failed');
+
+      // analysis runs as a background job; poll until it finishes
+      let status = job.status;
+      while (status === 'queued' || status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const statusRes = await fetch(`${API_BASE}/jobs/${job.job_id}`);
+        const statusJson = await statusRes.json();
+        if (!statusRes.ok) throw new Error(statusJson.detail || 'Analysis failed');
+        status = statusJson.status;
+      }
+
+      const resultRes = await fetch(`${API_BASE}/jobs/${job.job_id}/result`);
+      const json = await resultRes.json();
+      if (!resultRes.ok) throw new Error(json.detail || 'Analysis failed');
       setAnalysisResult(json);
     } catch (err: any) {
       console.error('Analysis error', err);